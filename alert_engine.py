@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from utils import logger, send_email
+
+LEVEL_NAMES = {0: "风控正常", 1: "一级熔断(预警)", 2: "二级熔断(禁止重仓)", 3: "三级熔断(强制空仓)"}
+
+class AlertNotifier:
+    """
+    [V15 轻量通知]
+    纯文本邮件 / Webhook 两种通道，不渲染 HTML 报告。
+    传入 mailer (MailQueue) 时邮件走投递队列，与报告邮件共用连接。
+    webhook_url 可指向本地桩服务做联调。
+    """
+    def __init__(self, config, mailer=None):
+        cfg = config.get('global', {}).get('alerts', {})
+        self.mailer = mailer
+        self.webhook_url = cfg.get('webhook_url') or os.getenv('ALERT_WEBHOOK_URL')
+        self.webhook_timeout = cfg.get('webhook_timeout', 5)
+        self.use_email = cfg.get('email', True)
+
+    @staticmethod
+    def format_event(event):
+        arrow = "⬆️" if event['new_level'] > event['old_level'] else "⬇️"
+        return (f"{arrow} [{event['name']}] {LEVEL_NAMES[event['old_level']]} -> {LEVEL_NAMES[event['new_level']]} "
+                f"| 跌幅 {event['pct_change']:.2%}")
+
+    def notify(self, event):
+        text = self.format_event(event)
+        if self.webhook_url:
+            try:
+                requests.post(self.webhook_url, json={"text": text, "event": event}, timeout=self.webhook_timeout)
+            except Exception as e:
+                logger.error(f"Webhook 告警失败: {e}")
+        if self.use_email:
+            subject = f"玄铁 V15 熔断告警: {event['name']} Lv{event['new_level']}"
+            if self.mailer is not None:
+                self.mailer.enqueue(subject, text, subtype='plain')
+            else:
+                send_email(subject, text, subtype='plain')
+
+class FuseAlertEngine:
+    """
+    [V15 熔断事件层]
+    每个 tick 对比熔断等级，等级变化即产生事件:
+    - 防抖: 新等级需连续 debounce_ticks 个 tick 出现才确认
+    - 迟滞: 降级时跌幅需回升超过阈值 hysteresis 才算解除，避免在阈值附近来回抖动
+    事件在后台线程派发，tick -> 派发完成 的延迟逐条记录。
+    """
+    def __init__(self, config, risk_ctrl, notifier):
+        cfg = config.get('global', {}).get('alerts', {})
+        self.debounce_ticks = cfg.get('debounce_ticks', 2)
+        self.hysteresis = cfg.get('hysteresis', 0.005)
+        self.risk_ctrl = risk_ctrl
+        self.notifier = notifier
+        self.levels = {}
+        self.pending = {}
+        self.latencies = []
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def observe(self, tick_ts, code, name, pct_change, vol_ratio=1.0):
+        """输入一个 tick 的观测，确认等级变化时返回事件并派发"""
+        confirmed = self.levels.get(code, 0)
+        raw = self.risk_ctrl.fuse_level(pct_change, vol_ratio)
+        if raw < confirmed:
+            # 迟滞: 按更差的跌幅再判一次，仍未低于当前等级则维持
+            raw = max(raw, min(confirmed, self.risk_ctrl.fuse_level(pct_change - self.hysteresis, vol_ratio)))
+
+        if raw == confirmed:
+            self.pending.pop(code, None)
+            return None
+
+        level, count = self.pending.get(code, (raw, 0))
+        count = count + 1 if level == raw else 1
+        if count < self.debounce_ticks:
+            self.pending[code] = (raw, count)
+            return None
+
+        self.pending.pop(code, None)
+        self.levels[code] = raw
+        event = {
+            "code": code,
+            "name": name,
+            "old_level": confirmed,
+            "new_level": raw,
+            "pct_change": pct_change,
+            "tick_ts": tick_ts
+        }
+        logger.warning(f"🚨 [熔断事件] {AlertNotifier.format_event(event)}")
+        self.executor.submit(self._dispatch, event)
+        return event
+
+    def on_tick(self, tick_ts, states):
+        """IntradayDaemon 的 tick 回调"""
+        for code, s in states.items():
+            tech = s['tech']
+            self.observe(tick_ts, code, s['fund']['name'], tech.get('pct_change', 0.0),
+                         tech.get('risk_factors', {}).get('vol_ratio', 1.0))
+
+    def _dispatch(self, event):
+        try:
+            self.notifier.notify(event)
+        except Exception as e:
+            logger.error(f"告警派发失败 {event['name']}: {e}")
+        latency = time.time() - event['tick_ts']
+        with self.lock:
+            self.latencies.append(latency)
+        logger.info(f"📨 [告警] {event['name']} 已派发，延迟 {latency * 1000:.0f}ms")
+
+    def latency_report(self):
+        with self.lock:
+            data = sorted(self.latencies)
+        if not data: return {"count": 0}
+        return {
+            "count": len(data),
+            "p50_ms": round(data[len(data) // 2] * 1000, 1),
+            "p95_ms": round(data[min(len(data) - 1, int(len(data) * 0.95))] * 1000, 1),
+            "max_ms": round(data[-1] * 1000, 1)
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        logger.info(f"📊 [告警延迟] {self.latency_report()}")
@@ -0,0 +1,90 @@
+import time
+from technical_analyzer import TechnicalAnalyzer
+from trading_calendar import get_calendar
+from utils import logger, get_beijing_time
+
+class IntradayDaemon:
+    """
+    [V15 盘中守护模式]
+    启动时每只基金只下载一次历史，之后每个轮询周期:
+    1. 拉取一次全市场快照 (所有基金共享)
+    2. 把快照缝合进每只基金的尾部窗口
+    3. 重算指标并重跑 RiskController
+    每只基金只保留固定长度的尾部窗口，单次 tick 的开销只随基金数量增长，与历史长度无关。
+    """
+    def __init__(self, config, fetcher, risk_ctrl):
+        self.config = config
+        self.fetcher = fetcher
+        self.risk_ctrl = risk_ctrl
+        daemon_cfg = config.get('global', {}).get('daemon', {})
+        self.poll_interval = daemon_cfg.get('poll_interval', 60)
+        self.window_bars = daemon_cfg.get('window_bars', 120)
+        self.funds = {f['code']: f for f in config.get('funds', [])}
+        self.windows = {}
+        self.state = {}
+        self.volatility = 0.015
+        self.tick_handlers = []
+        self.calendar = get_calendar()
+
+    def add_tick_handler(self, handler):
+        """注册回调: handler(tick_ts, states)，states = {code: {"fund","tech","risk"}}"""
+        self.tick_handlers.append(handler)
+
+    def bootstrap(self):
+        for code, fund in self.funds.items():
+            try:
+                df = self.fetcher.get_fund_history(code)
+            except Exception as e:
+                logger.error(f"守护模式初始化失败 {fund['name']}: {e}")
+                continue
+            if df is None or df.empty: continue
+            self.windows[code] = df.tail(self.window_bars)
+        logger.info(f"🛰️ [守护模式] 已载入 {len(self.windows)}/{len(self.funds)} 只基金，窗口 {self.window_bars} 根K线")
+
+    def tick(self):
+        tick_ts = time.time()
+        snapshot = self.fetcher.fetch_spot_snapshot(self.windows.keys())
+
+        states = {}
+        for code, window in self.windows.items():
+            fund = self.funds[code]
+            candle = snapshot.get(code)
+            if candle is not None:
+                window = self.fetcher.stitch_candle(window, candle).tail(self.window_bars)
+                self.windows[code] = window
+            tech = TechnicalAnalyzer.calculate_indicators(window)
+            if not tech: continue
+            risk = self.risk_ctrl.analyze_risk(fund['name'], tech, self.volatility)
+            states[code] = {"fund": fund, "tech": tech, "risk": risk}
+
+        self.state.update(states)
+        cost = time.time() - tick_ts
+        fused = sum(1 for s in states.values() if s['risk']['fuse_level'] > 0)
+        logger.info(f"🛰️ [守护模式] tick 完成: {len(states)} 只基金 | 熔断 {fused} 只 | 耗时 {cost:.2f}s")
+
+        for handler in self.tick_handlers:
+            try:
+                handler(tick_ts, states)
+            except Exception as e:
+                logger.error(f"tick 回调失败: {e}")
+        return states
+
+    def run(self):
+        logger.info(f">>> 🛰️ 玄铁守护模式启动 (轮询间隔 {self.poll_interval}s)")
+        self.volatility = self.fetcher.get_market_volatility()
+        self.bootstrap()
+        if not self.windows:
+            logger.warning("无可监控基金，守护模式退出")
+            return
+
+        while True:
+            session = self.calendar.session(get_beijing_time())
+            if session == "closed":
+                logger.info("🛰️ [守护模式] 已收盘 (或非交易日)，退出")
+                return
+            if session in ("am", "pm"):
+                try:
+                    self.tick()
+                except Exception as e:
+                    logger.error(f"tick 异常: {e}")
+            time.sleep(self.poll_interval)
@@ -2,121 +2,241 @@ import akshare as ak
 import pandas as pd
 import time
 import random
+import functools
 import numpy as np
-from datetime import datetime, time as dt_time
-from utils import logger, retry, get_beijing_time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils import logger, retry, get_beijing_time, get_breaker, remaining_budget
+from trading_calendar import get_calendar
+from lookback_planner import LookbackPlanner, FULL_HISTORY_START
 
 try:
     import yfinance as yf
 except ImportError:
     yf = None
 
+HISTORY_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
 class DataFetcher:
-    def __init__(self):
+    def __init__(self, config=None, scoreboard=None):
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         }
+        source_cfg = (config or {}).get('global', {}).get('data_source', {})
+        self.hedge = source_cfg.get('hedge', False)
+        self.hedge_after = source_cfg.get('hedge_after', 3.0)
+        self.history_source = {}  # code -> 本次胜出的数据源
+        self.scoreboard = scoreboard
+        self.planner = LookbackPlanner.from_config(config)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=source_cfg.get('hedge_workers', 6)) if self.hedge else None
 
     def _is_trading_time(self):
-        now = get_beijing_time()
-        if now.weekday() >= 5: return False
-        current_time = now.time()
-        start = dt_time(9, 30)
-        end = dt_time(15, 0)
-        return start <= current_time <= end
+        """交易日的连续竞价时段 (剔除节假日与午休)"""
+        return get_calendar().is_trading_time(get_beijing_time())
 
     @retry(retries=2, delay=2)
-    def get_market_volatility(self, window=20):
-        """[V15] 获取市场波动率"""
+    def get_market_volatility(self, window=20, fallback=0.015):
+        """[V15] 获取市场波动率；取不到时返回 fallback，fallback=None 时抛出异常 (断点续跑不缓存兜底值)"""
         try:
             df = ak.stock_zh_index_daily(symbol="sh000300")
-            if df.empty: return 0.015
+            if df.empty: raise ValueError("沪深300 日线为空")
             df['close'] = pd.to_numeric(df['close'])
             df['pct_change'] = df['close'].pct_change()
             volatility = df['pct_change'].tail(window).std()
             logger.info(f"🌊 [市场环境] 沪深300 近{window}日波动率: {volatility:.2%}")
             return volatility
         except Exception:
-            return 0.015
+            if fallback is None: raise
+            return fallback
 
-    def _fetch_realtime_candle(self, code):
-        """V14.28 实时快照"""
+    def fetch_spot_snapshot(self, codes=None):
+        """[V15] 一次拉取全市场快照，返回 {code: candle}，每个轮询周期只调用一次"""
         try:
             df_spot = ak.stock_zh_a_spot_em()
-            target = df_spot[df_spot['代码'] == code]
-            if target.empty: return None
-            
-            row = target.iloc[0]
-            current_close = float(row['最新价'])
-            if current_close <= 0: return None
-
-            candle = pd.Series({
-                'close': current_close,
-                'high': float(row['最高']),
-                'low': float(row['最低']),
-                'open': float(row['今开']),
-                'volume': float(row['成交量']) if '成交量' in row else 0.0,
-                'date': get_beijing_time().replace(hour=0, minute=0, second=0, microsecond=0)
-            })
-            return candle
-        except Exception:
-            return None
+        except Exception as e:
+            logger.warning(f"实时快照微瑕: {str(e)[:50]}")
+            return {}
+        if codes is not None:
+            df_spot = df_spot[df_spot['代码'].isin(list(codes))]
 
-    @retry(retries=2, delay=3)
-    def get_fund_history(self, code):
-        """V14 完整兜底逻辑: 东财 -> 新浪 -> Yahoo"""
-        time.sleep(random.uniform(1.0, 2.0))
-        df_hist = None
+        today = pd.Timestamp(get_beijing_time().date())
+        snapshot = {}
+        for _, row in df_spot.iterrows():
+            try:
+                current_close = float(row['最新价'])
+                if current_close <= 0: continue
+                snapshot[row['代码']] = pd.Series({
+                    'close': current_close,
+                    'high': float(row['最高']),
+                    'low': float(row['最低']),
+                    'open': float(row['今开']),
+                    'volume': float(row['成交量']) if '成交量' in row else 0.0,
+                    'date': today
+                })
+            except (TypeError, ValueError):
+                continue
+        return snapshot
+
+    def _fetch_realtime_candle(self, code):
+        """V14.28 实时快照"""
+        return self.fetch_spot_snapshot([code]).get(code)
+
+    @staticmethod
+    def stitch_candle(df_hist, real_candle):
+        """将实时K线缝合到历史末尾: 同日覆盖，新日追加"""
+        today_date = pd.Timestamp(real_candle['date'])
+        if df_hist.index[-1] == today_date:
+            df_hist = df_hist.copy()
+            for col in ['open', 'high', 'low', 'close', 'volume']:
+                if col in df_hist.columns:
+                    df_hist.iloc[-1, df_hist.columns.get_loc(col)] = real_candle[col]
+            return df_hist
+        df_real = pd.DataFrame([real_candle]).set_index('date')
+        return pd.concat([df_hist, df_real])
+
+    def _fetch_eastmoney(self, code, start=None):
+        start = start or self.planner.start_date()
+        df = ak.fund_etf_hist_em(symbol=code, period="daily", start_date=start.strftime("%Y%m%d"), end_date="20500101")
+        if df.empty: return None
+        df = df.rename(columns={"日期": "date", "收盘": "close", "最高": "high", "最低": "low", "开盘": "open", "成交量": "volume"})
+        df['date'] = pd.to_datetime(df['date'])
+        df.set_index('date', inplace=True)
+        return df
+
+    def _fetch_sina(self, code):
+        symbol = f"sh{code}" if code.startswith('5') or code.startswith('6') else f"sz{code}"
+        df = ak.stock_zh_index_daily(symbol=symbol)
+        if df.empty: return None
+        df['date'] = pd.to_datetime(df['date'])
+        df.set_index('date', inplace=True)
+        return df
+
+    def _fetch_yahoo(self, code, start=None):
+        suffix = ".SS" if code.startswith('5') or code.startswith('6') else ".SZ"
+        tk = yf.Ticker(code + suffix)
+        df = tk.history(start=(start or self.planner.start_date()).isoformat())
+        if df.empty: return None
+        df = df.rename(columns={"Close": "close", "High": "high", "Low": "low", "Open": "open", "Volume": "volume"})
+        df.index = df.index.tz_localize(None)
+        return df
+
+    def _history_sources(self, start=None):
+        """start: 只需要该日及之后的K线 (增量补齐)；新浪不支持起始日期，返回全量后由调用方截取"""
+        sources = {"eastmoney": functools.partial(self._fetch_eastmoney, start=start), "sina": self._fetch_sina}
+        if yf: sources["yahoo"] = functools.partial(self._fetch_yahoo, start=start)
+        names = list(sources)
+        # 按上次运行积累的健康度排序，默认顺序: 东财 -> 新浪 -> Yahoo
+        if self.scoreboard is not None:
+            names = self.scoreboard.order("history", names)
+        return [(name, sources[name]) for name in names]
 
-        # 1. 东财
+    @staticmethod
+    def _normalize_history(df):
+        """统一各数据源的表结构: 标准列名、数值类型、无时区的升序日期索引"""
+        if df is None or df.empty or 'close' not in df.columns: return None
+        df = df[[c for c in HISTORY_COLUMNS if c in df.columns]].apply(pd.to_numeric, errors='coerce')
+        if df.index.tz is not None: df.index = df.index.tz_localize(None)
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        df = df.dropna(subset=['close'])
+        return df if not df.empty else None
+
+    def _try_source(self, name, fetch, code):
+        """单个数据源: 熔断器打开则跳过，结果回写熔断器"""
+        breaker = get_breaker(f"history.{name}")
+        if not breaker.allow(): return None
+        start = time.monotonic()
         try:
-            df = ak.fund_etf_hist_em(symbol=code, period="daily", start_date="20200101", end_date="20500101")
-            if not df.empty:
-                df = df.rename(columns={"日期": "date", "收盘": "close", "最高": "high", "最低": "low", "开盘": "open", "成交量": "volume"})
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index('date', inplace=True)
-                df_hist = df
+            df = self._normalize_history(fetch(code))
         except Exception as e:
-            logger.warning(f"东财源微瑕 {code}: {str(e)[:50]}")
+            logger.warning(f"{name} 源微瑕 {code}: {str(e)[:50]}")
+            df = None
+        breaker.record(df is not None)
+        if self.scoreboard is not None:
+            self.scoreboard.record(f"history.{name}", df is not None, time.monotonic() - start)
+        return df
 
-        # 2. 新浪兜底
-        if df_hist is None or df_hist.empty:
-            try:
-                symbol = f"sh{code}" if code.startswith('5') or code.startswith('6') else f"sz{code}"
-                df = ak.stock_zh_index_daily(symbol=symbol)
-                if not df.empty:
-                    df = df.rename(columns={"date": "date", "close": "close", "high": "high", "low": "low", "open": "open", "volume": "volume"})
-                    df['date'] = pd.to_datetime(df['date'])
-                    df.set_index('date', inplace=True)
-                    df_hist = df
-            except Exception:
-                pass
-        
-        # 3. Yahoo 兜底 (V15 保留)
-        if (df_hist is None or df_hist.empty) and yf:
-            try:
-                suffix = ".SS" if code.startswith('5') or code.startswith('6') else ".SZ"
-                tk = yf.Ticker(code + suffix)
-                df = tk.history(period="1y")
-                if not df.empty:
-                    df = df.rename(columns={"Close": "close", "High": "high", "Low": "low", "Open": "open", "Volume": "volume"})
-                    df.index = df.index.tz_localize(None)
-                    df_hist = df
-            except:
-                pass
+    def _fetch_sequential(self, code, sources):
+        for name, fetch in sources:
+            remaining = remaining_budget()
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"⏱️ {code} 时间预算耗尽，停止尝试后续数据源")
+                break
+            df = self._try_source(name, fetch, code)
+            if df is not None: return df, name
+        return None, None
+
+    def _fetch_hedged(self, code, sources):
+        """
+        对冲模式: 主源 hedge_after 秒内未返回 (或已失败) 就并行发起下一个源，
+        取最先返回的有效结果，其余请求的结果直接丢弃。
+        """
+        pending = {}
+        queue = list(sources)
+
+        def launch():
+            name, fetch = queue.pop(0)
+            pending[self._hedge_pool.submit(self._try_source, name, fetch, code)] = name
+
+        launch()
+        while pending:
+            remaining = remaining_budget()
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"⏱️ {code} 时间预算耗尽，放弃对冲等待")
+                break
+            timeout = self.hedge_after if queue else remaining
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done and queue:
+                logger.info(f"🏇 {code} {'/'.join(pending.values())} 超过 {self.hedge_after}s 未返回，对冲下一个源")
+                launch()
+                continue
+            if not done: continue  # 所有源都已发出: 回到预算检查
+            for future in done:
+                name = pending.pop(future)
+                df = future.result()
+                if df is not None:
+                    return df, name
+            # 有源已失败: 立即补位，不再等待对冲阈值
+            if queue: launch()
+        return None, None
+
+    @retry(retries=2, delay=3)
+    def get_fund_history(self, code, start=None):
+        """V14 完整兜底逻辑: 东财 -> 新浪 -> Yahoo；start 给定时只取该日起的K线"""
+        time.sleep(random.uniform(1.0, 2.0))
+        sources = self._history_sources(start)
+        if self.hedge:
+            df_hist, winner = self._fetch_hedged(code, sources)
+        else:
+            df_hist, winner = self._fetch_sequential(code, sources)
 
         if df_hist is None or df_hist.empty: return None
+        self.history_source[code] = winner
+        logger.info(f"🏁 {code} 行情来源: {winner}")
+
+        # 每次运行抽查 drift_checks_per_run 只基金的截断偏差
+        if self.planner.take_drift_check():
+            self._check_lookback_drift(code, df_hist)
+        # 新浪等源不支持起始日期，返回的是全量: 截到规划长度
+        df_hist = self.planner.trim(df_hist)
 
-        # 实时缝合
+        return self.stitch_realtime(code, df_hist)
+
+    def _check_lookback_drift(self, code, df_hist):
+        """返回的已是全量 (新浪) 就直接比对，否则从东财另取 2020 年以来的全量；抽查失败不影响本次行情"""
+        try:
+            df_full = df_hist if len(df_hist) >= 2 * self.planner.bars else \
+                self._normalize_history(self._fetch_eastmoney(code, start=FULL_HISTORY_START))
+            if df_full is None or len(df_full) < 2 * self.planner.bars:
+                logger.info(f"📐 [回看规划] {code} 全量K线不足，跳过偏差抽查")
+                return
+            self.planner.check_drift(code, df_full)
+        except Exception as e:
+            logger.warning(f"📐 [回看规划] {code} 偏差抽查失败: {str(e)[:50]}")
+
+    def stitch_realtime(self, code, df_hist):
+        """实时缝合: 仅在连续竞价时段拉取快照"""
         if self._is_trading_time():
             real_candle = self._fetch_realtime_candle(code)
             if real_candle is not None:
-                last_date = df_hist.index[-1]
-                today_date = pd.Timestamp(real_candle['date'])
-                if last_date != today_date:
-                    df_real = pd.DataFrame([real_candle]).set_index('date')
-                    df_hist = pd.concat([df_hist, df_real])
-                else:
-                    df_hist.iloc[-1] = real_candle
-
+                df_hist = self.stitch_candle(df_hist, real_candle)
         return df_hist
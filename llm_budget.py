@@ -0,0 +1,104 @@
+import re
+import math
+import threading
+
+_CJK = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]')
+HOT_KEYS = ('财社', '突发', '重磅')
+
+def estimate_tokens(text):
+    """本地估算: 中文约 1 字 1 token，其余约 4 字符 1 token (API 未返回 usage 时兜底)"""
+    if not text: return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+def _cut_chars(text, max_tokens):
+    """按字符硬截断到 max_tokens 以内"""
+    out, used = [], 0.0
+    for ch in text:
+        used += 1 if _CJK.match(ch) else 0.25
+        if math.ceil(used) > max_tokens: break
+        out.append(ch)
+    return "".join(out)
+
+def _cut_line(line, max_tokens, sep=" | "):
+    """单行超预算: 先按 " | " 分段整段保留，首段也放不下时按字符硬截断"""
+    parts, used = [], 0
+    for part in line.split(sep):
+        cost = estimate_tokens(part) + (estimate_tokens(sep) if parts else 0)
+        if used + cost > max_tokens: break
+        parts.append(part)
+        used += cost
+    return sep.join(parts) if parts else _cut_chars(line, max_tokens)
+
+def truncate_tokens(text, max_tokens):
+    """按行截断到 max_tokens 以内；放不下的那一行按 " | " 分段或按字符截断，保证不会整段丢空"""
+    lines, used = [], 0
+    for line in str(text).splitlines() or [str(text)]:
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            rest = _cut_line(line, max_tokens - used - 1)
+            if rest: lines.append(rest)
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+def pack_headlines(headlines, max_tokens, fresh=None):
+    """
+    按优先级装箱: 本次新增 > 突发/财社 > 其余，同级保持原顺序；
+    逐条放入直到 token 预算用尽，超长单条跳过而不截断。
+    """
+    fresh = fresh or set()
+    def priority(item):
+        i, n = item
+        return (n not in fresh, not any(k in n for k in HOT_KEYS), i)
+    packed, used = [], 0
+    for _, n in sorted(enumerate(headlines), key=priority):
+        cost = estimate_tokens(n) + 1
+        if used + cost > max_tokens: continue
+        packed.append(n)
+        used += cost
+    return packed
+
+class TokenLedger:
+    """
+    [V15 LLM 账本]
+    按调用名累计 prompt / completion token 与耗时；优先使用 API 返回的 usage，缺失时用本地估算。
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []
+
+    def record(self, name, prompt_tokens, completion_tokens, latency, estimated=False):
+        with self.lock:
+            self.records.append({
+                "name": name,
+                "prompt": prompt_tokens,
+                "completion": completion_tokens,
+                "latency": latency,
+                "estimated": estimated
+            })
+
+    def summary(self):
+        with self.lock:
+            records = list(self.records)
+        by_name = {}
+        for r in records:
+            s = by_name.setdefault(r['name'], {"calls": 0, "prompt": 0, "completion": 0, "latency": 0.0, "estimated": 0})
+            s['calls'] += 1
+            s['prompt'] += r['prompt']
+            s['completion'] += r['completion']
+            s['latency'] += r['latency']
+            s['estimated'] += 1 if r['estimated'] else 0
+        return by_name
+
+    def table(self):
+        by_name = self.summary()
+        lines = [f"{'call':<16}{'calls':>6}{'prompt':>9}{'compl':>8}{'avg_s':>8}  est"]
+        total = {"calls": 0, "prompt": 0, "completion": 0, "latency": 0.0, "estimated": 0}
+        for name, s in sorted(by_name.items()):
+            lines.append(f"{name:<16}{s['calls']:>6}{s['prompt']:>9}{s['completion']:>8}{s['latency'] / s['calls']:>8.1f}  {s['estimated']}")
+            for k in total: total[k] += s[k]
+        if total['calls']:
+            lines.append(f"{'TOTAL':<16}{total['calls']:>6}{total['prompt']:>9}{total['completion']:>8}{total['latency'] / total['calls']:>8.1f}  {total['estimated']}")
+        return "\n".join(lines)
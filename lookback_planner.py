@@ -0,0 +1,127 @@
+import sys
+import math
+import threading
+from datetime import date
+from utils import logger, get_beijing_time
+from trading_calendar import get_calendar
+
+# 指标 -> (计算所需日K线数, EMA 平滑系数 α；简单均线/差分为 None)
+INDICATOR_WINDOWS = {
+    "rsi": (14 + 1, 1 / 14),          # Wilder 平滑
+    "macd": (26 + 9, 2 / (26 + 1)),   # 慢线 EMA26 + 信号线 EMA9
+    "bollinger": (20, None),
+    "vol_ratio": (5, None),
+    "obv_slope": (10 + 1, None),      # 只用 10 日差分，与 OBV 累计起点无关
+    "weekly_ma5": (5 * 5 + 5, None),  # 5 根周K + 当周未走完
+}
+MIN_BARS = 30  # TechnicalAnalyzer 的最低K线要求
+FULL_HISTORY_START = date(2020, 1, 1)
+
+def ema_warmup(alpha, tolerance):
+    """EMA 初值的影响按 (1-α)^n 衰减，衰减到 tolerance 以下所需的K线数"""
+    return math.ceil(math.log(tolerance) / math.log(1 - alpha))
+
+def _flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict): out.update(_flatten(v, key + "."))
+        else: out[key] = v
+    return out
+
+class LookbackPlanner:
+    """
+    [V15 回看规划]
+    根据启用的指标推导最少需要的日K线数: max(窗口 + EMA 收敛预热) + 安全余量，
+    再借交易日历换算为起始日期，传给各数据源，避免每次都下载 2020 年以来的全部行情。
+    截断可能让 EMA 类指标与全量计算有偏差，check_drift 用全量数据抽查并告警。
+    """
+    def __init__(self, indicators=None, ema_tolerance=1e-3, margin_bars=10, drift_tolerance=0.01,
+                 drift_checks_per_run=1, enabled=True):
+        self.indicators = list(indicators or INDICATOR_WINDOWS)
+        self.ema_tolerance = ema_tolerance
+        self.margin_bars = margin_bars
+        self.drift_tolerance = drift_tolerance
+        self.drift_checks_left = drift_checks_per_run
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.bars = self.required_bars()
+
+    @classmethod
+    def from_config(cls, config):
+        cfg = (config or {}).get('global', {}).get('lookback', {})
+        return cls(indicators=cfg.get('indicators'),
+                   ema_tolerance=cfg.get('ema_tolerance', 1e-3),
+                   margin_bars=cfg.get('margin_bars', 10),
+                   drift_tolerance=cfg.get('drift_tolerance', 0.01),
+                   drift_checks_per_run=cfg.get('drift_checks_per_run', 1),
+                   enabled=cfg.get('enabled', True))
+
+    def required_bars(self):
+        need = MIN_BARS
+        for name in self.indicators:
+            if name not in INDICATOR_WINDOWS:
+                logger.warning(f"📐 未知指标 {name}，回看规划忽略")
+                continue
+            window, alpha = INDICATOR_WINDOWS[name]
+            need = max(need, window + (ema_warmup(alpha, self.ema_tolerance) if alpha else 0))
+        return need + self.margin_bars
+
+    def start_date(self, now=None):
+        """最早需要的K线日期；关闭时退回全量 (2020-01-01 起)"""
+        if not self.enabled: return FULL_HISTORY_START
+        calendar = get_calendar()
+        last = calendar.last_complete_day(now or get_beijing_time())
+        return calendar.trading_days_before(last, self.bars)
+
+    def trim(self, df):
+        """不支持起始日期参数的数据源 (新浪) 返回全量，这里截到规划长度"""
+        if not self.enabled or df is None or len(df) <= self.bars: return df
+        return df.iloc[-self.bars:]
+
+    def take_drift_check(self):
+        """每次运行只抽查少量基金，避免额外开销"""
+        with self.lock:
+            if not self.enabled or self.drift_checks_left <= 0: return False
+            self.drift_checks_left -= 1
+            return True
+
+    def check_drift(self, code, df_full):
+        """
+        用全量K线与截断K线分别计算指标，返回超出容差的字段 {field: (截断值, 全量值)}。
+        MACD 以价格为尺度比较，其余数值以 max(|全量值|, 1) 为尺度；文字信号要求完全一致。
+        """
+        from technical_analyzer import TechnicalAnalyzer
+        full = _flatten(TechnicalAnalyzer.calculate_indicators(df_full))
+        short = _flatten(TechnicalAnalyzer.calculate_indicators(df_full.iloc[-self.bars:]))
+        price = abs(full.get('price') or 1.0)
+        drifted = {}
+        for key, b in full.items():
+            a = short.get(key)
+            if isinstance(b, str) or isinstance(a, str):
+                if a != b: drifted[key] = (a, b)
+                continue
+            if a is None or b is None: continue
+            scale = price if key.startswith('macd.') else max(abs(b), 1.0)
+            if abs(a - b) / scale > self.drift_tolerance:
+                drifted[key] = (a, b)
+        if drifted:
+            logger.warning(f"📐 [回看规划] {code} 截断到 {self.bars} 根K线后指标偏离全量计算: {drifted}，请调小 ema_tolerance 或加大 margin_bars")
+        else:
+            logger.info(f"📐 [回看规划] {code} {self.bars} 根K线与全量 {len(df_full)} 根计算一致")
+        return drifted
+
+if __name__ == "__main__":
+    # python lookback_planner.py [code ...]: 打印规划，并用东财全量数据校验偏差
+    import yaml
+    with open('config.yaml', 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    planner = LookbackPlanner.from_config(config)
+    print(f"回看K线: {planner.bars} 根 | 起始日期: {planner.start_date()} | 指标: {', '.join(planner.indicators)}")
+    codes = sys.argv[1:]
+    if codes:
+        from data_fetcher import DataFetcher
+        fetcher = DataFetcher(config)
+        for code in codes:
+            df = fetcher._normalize_history(fetcher._fetch_eastmoney(code, start=FULL_HISTORY_START))
+            if df is not None: planner.check_drift(code, df)
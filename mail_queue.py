@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import uuid
+import queue
+import smtplib
+import threading
+from utils import logger, build_message
+
+class MailQueue:
+    """
+    [V15 邮件投递队列]
+    1. enqueue 先把邮件落盘到 spool 目录，再交给后台线程，主流程不阻塞
+    2. 后台线程复用同一条 SMTP 连接，失败按指数退避重试
+    3. 发送成功才删除 spool 文件；本次没发出去的，下次启动时自动补发
+    """
+    def __init__(self, spool_dir='spool/mail', host=None, port=None, use_ssl=True,
+                 user=None, password=None, max_retries=4, base_delay=2, max_delay=60):
+        self.spool_dir = spool_dir
+        self.host = host or 'smtp.qq.com'
+        self.port = port or 465
+        self.use_ssl = use_ssl
+        self.user = user
+        self.password = password
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue = queue.Queue()
+        self.smtp = None
+        self.worker = None
+        self.pending = 0
+        self.cond = threading.Condition()
+        self.stopping = threading.Event()
+
+    @classmethod
+    def from_env(cls, spool_dir='spool/mail'):
+        return cls(
+            spool_dir=spool_dir,
+            host=os.environ.get('MAIL_SMTP_HOST', 'smtp.qq.com'),
+            port=int(os.environ.get('MAIL_SMTP_PORT', 465)),
+            use_ssl=os.environ.get('MAIL_SMTP_SSL', '1') != '0',
+            user=os.environ.get('MAIL_USER'),
+            password=os.environ.get('MAIL_PASS')
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.user and self.password)
+
+    def start(self):
+        """启动后台线程，并把上次遗留在 spool 中的邮件重新入队"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        leftovers = sorted(f for f in os.listdir(self.spool_dir) if f.endswith('.json'))
+        if not self.enabled:
+            logger.warning("未配置邮件账户，邮件仅落盘不发送")
+            return self
+        for name in leftovers:
+            self._submit(os.path.join(self.spool_dir, name))
+        if leftovers:
+            logger.info(f"📮 [邮件队列] 补发上次遗留邮件 {len(leftovers)} 封")
+        self.worker = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+        self.worker.start()
+        return self
+
+    def enqueue(self, subject, content, subtype='html'):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.json"
+        path = os.path.join(self.spool_dir, name)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"subject": subject, "content": content, "subtype": subtype}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        if self.worker is not None:
+            self._submit(path)
+        logger.info(f"📮 [邮件队列] 已落盘: {subject}")
+        return path
+
+    def _submit(self, path):
+        with self.cond:
+            self.pending += 1
+        self.queue.put(path)
+
+    def _connect(self):
+        if self.smtp is not None:
+            try:
+                if self.smtp.noop()[0] == 250: return self.smtp
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._disconnect()
+        smtp_cls = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        self.smtp = smtp_cls(self.host, self.port, timeout=30)
+        self.smtp.login(self.user, self.password)
+        return self.smtp
+
+    def _disconnect(self):
+        if self.smtp is None: return
+        try:
+            self.smtp.quit()
+        except Exception:
+            pass
+        self.smtp = None
+
+    def _deliver(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            mail = json.load(f)
+        message = build_message(mail['subject'], mail['content'], self.user, mail.get('subtype', 'html'))
+        for attempt in range(self.max_retries):
+            try:
+                self._connect().sendmail(self.user, [self.user], message.as_string())
+                os.remove(path)
+                logger.info(f"📧 邮件发送成功: {mail['subject']}")
+                return True
+            except (smtplib.SMTPException, OSError) as e:
+                self._disconnect()
+                if attempt == self.max_retries - 1 or self.stopping.is_set():
+                    logger.error(f"邮件发送失败，保留在 spool 待下次补发: {e}")
+                    return False
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                logger.warning(f"⚠️ 邮件发送失败，{delay}秒后重试 ({attempt+1}/{self.max_retries}): {e}")
+                self.stopping.wait(delay)
+        return False
+
+    def _run(self):
+        while True:
+            path = self.queue.get()
+            if path is None: break
+            try:
+                self._deliver(path)
+            except Exception as e:
+                logger.error(f"邮件投递异常 {path}: {e}")
+            finally:
+                with self.cond:
+                    self.pending -= 1
+                    self.cond.notify_all()
+        self._disconnect()
+
+    def flush(self, timeout=None):
+        """等待队列清空，返回是否全部处理完毕"""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.pending == 0, timeout=timeout)
+
+    def close(self, timeout=120):
+        """等待在途邮件 (最多 timeout 秒)，然后关闭连接；未发出的邮件留在 spool"""
+        if self.worker is None: return True
+        done = self.flush(timeout)
+        if not done:
+            self.stopping.set()
+            logger.warning("📮 [邮件队列] 超时，剩余邮件保留在 spool")
+        self.queue.put(None)
+        self.worker.join(timeout=5)
+        return done
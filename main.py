@@ -1,7 +1,10 @@
 import yaml
 import os
+import argparse
 import time
 import json
+import pandas as pd
+from datetime import timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from data_fetcher import DataFetcher
 from technical_analyzer import TechnicalAnalyzer
@@ -9,227 +12,64 @@ from news_analyst import NewsAnalyst
 from risk_control import RiskController
 from valuation_engine import ValuationEngine
 from portfolio_tracker import PortfolioTracker
-from utils import send_email, logger
+from portfolio_risk import PortfolioRisk
+from run_archive import RunArchive
+from price_store import PriceStore, analyze_in_pool
+from daemon import IntradayDaemon
+from alert_engine import FuseAlertEngine, AlertNotifier
+from report_renderer import render_html_report_v15_full
+from mail_queue import MailQueue
+from source_scoreboard import SourceScoreboard
+from news_dedup import HeadlineDeduper
+from trading_calendar import get_calendar
+from run_checkpoint import RunCheckpoint
+from stage_graph import StageGraph
+from utils import logger, configure_retry, fund_deadline, get_beijing_time
+
+# LLM 失败时的兜底观点: 照常出卡片，但不写入检查点，重跑时重新分析
+AI_FALLBACK = {"bull_say": "API Error", "bear_say": "API Error", "comment": "手动检查", "adjustment": 0}
+
+def is_fallback(res):
+    return bool(res) and res.get('ai') == AI_FALLBACK
 
 def load_config():
     with open('config.yaml', 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
-# --- [V15 UI 终极渲染引擎] 100% 还原 V14 细节并融合 V15 风控 ---
-def render_html_report_v15_full(all_news, results, cio_html, advisor_html, volatility):
-    # 1. 新闻雷达 (支持去重与高亮)
-    news_html = ""
-    seen_titles = set()
-    unique_news = []
-    for n in all_news:
-        # 简单去重逻辑
-        raw_t = n.split(']')[-1].strip() if ']' in n else n
-        if raw_t not in seen_titles:
-            unique_news.append(n)
-            seen_titles.add(raw_t)
-    
-    # 排序：突发/财社新闻置顶
-    unique_news.sort(key=lambda x: (not ('财社' in x or '突发' in x or '重磅' in x)), reverse=False)
-
-    for news in unique_news[:18]: # 展示更多新闻
-        color = "#ffb74d" if ('财社' in news or '突发' in news) else "#999"
-        news_html += f"""
-        <div style="font-size:11px;color:#ccc;margin-bottom:5px;border-bottom:1px dashed #333;padding-bottom:3px;">
-            <span style="color:{color};margin-right:4px;">●</span>{news}
-        </div>
-        """
-
-    # 2. 历史信号点阵渲染 (V14遗失功能回归)
-    def render_dots(hist):
-        h = ""
-        # 取最近15次记录
-        for x in hist[-15:]:
-            c = "#d32f2f" if x['s']=='B' else ("#388e3c" if x['s'] in ['S','C'] else "#555")
-            h += f'<span style="display:inline-block;width:6px;height:6px;border-radius:50%;background:{c};margin-right:3px;box-shadow:0 0 2px rgba(0,0,0,0.5);" title="{x["date"]}"></span>'
-        return h
-
-    # 3. 基金卡片渲染
-    rows = ""
-    for r in results:
-        try:
-            tech = r.get('tech', {})
-            risk = r.get('risk', {})
-            ai = r.get('ai', {})
-            pos_info = r.get('position_info', {}) # 持仓数据
-            
-            score = r.get('score', 0)
-            fuse_level = risk.get('fuse_level', 0)
-            risk_msg = risk.get('risk_msg', '正常')
-            
-            # --- 颜色与徽章逻辑 ---
-            if fuse_level >= 3: 
-                border_color = "#b71c1c"
-                bg_gradient = "linear-gradient(90deg, rgba(60,0,0,0.9) 0%, rgba(20,20,20,0.95) 100%)"
-                badge_html = "<span style='background:#b71c1c;color:white;padding:2px 6px;border-radius:3px;font-size:10px;font-weight:bold;'>⛔ 熔断 Lv3 (强制空仓)</span>"
-            elif fuse_level == 2:
-                border_color = "#e65100"
-                bg_gradient = "linear-gradient(90deg, rgba(60,30,0,0.9) 0%, rgba(20,20,20,0.95) 100%)"
-                badge_html = "<span style='background:#e65100;color:white;padding:2px 6px;border-radius:3px;font-size:10px;font-weight:bold;'>⚠️ 熔断 Lv2 (禁止重仓)</span>"
-            elif fuse_level == 1:
-                border_color = "#fbc02d"
-                bg_gradient = "linear-gradient(90deg, rgba(40,40,0,0.9) 0%, rgba(20,20,20,0.95) 100%)"
-                badge_html = "<span style='background:#fbc02d;color:black;padding:2px 6px;border-radius:3px;font-size:10px;font-weight:bold;'>🛡️ 熔断 Lv1 (预警)</span>"
-            else:
-                border_color = "#2e7d32" if r['action'] == "买入" else "#555"
-                bg_gradient = "linear-gradient(90deg, rgba(10,40,10,0.9) 0%, rgba(20,20,20,0.95) 100%)" if r['action'] == "买入" else "linear-gradient(90deg, rgba(30,30,30,0.9) 0%, rgba(15,15,15,0.95) 100%)"
-                badge_html = "<span style='background:#2e7d32;color:white;padding:2px 6px;border-radius:3px;font-size:10px;'>✅ 风控正常</span>"
-
-            # --- 持仓收益逻辑 (V14遗失功能回归) ---
-            profit_html = ""
-            if pos_info.get('shares', 0) > 0:
-                cost = pos_info['cost']
-                curr = tech.get('price', 0)
-                if cost > 0:
-                    profit_pct = (curr - cost) / cost * 100
-                    profit_val = (curr - cost) * pos_info['shares']
-                    p_color = "#ff5252" if profit_val > 0 else "#69f0ae"
-                    profit_html = f"""
-                    <div style="font-size:12px;margin-bottom:8px;background:rgba(255,255,255,0.05);padding:4px 8px;border-radius:3px;display:flex;justify-content:space-between;">
-                        <span style="color:#aaa;">持仓成本: {cost:.3f}</span>
-                        <span style="color:{p_color};font-weight:bold;">{profit_val:+.1f}元 ({profit_pct:+.2f}%)</span>
-                    </div>
-                    """
-
-            # --- 辩论与裁决 ---
-            bull_say = ai.get('bull_say', 'N/A')
-            bear_say = ai.get('bear_say', 'N/A')
-            cio_say = ai.get('comment', 'N/A')
-            adj = ai.get('adjustment', 0)
-            
-            # CIO 修正分颜色
-            adj_color = "#ff5252" if adj > 0 else ("#69f0ae" if adj < 0 else "#ccc")
-
-            committee_html = ""
-            if bull_say != 'N/A':
-                committee_html = f"""
-                <div style="margin-top:12px;border-top:1px solid #444;padding-top:10px;">
-                    <div style="font-size:10px;color:#888;margin-bottom:6px;text-align:center;">--- V15 铁腕联邦投委会 ---</div>
-                    <div style="display:flex;gap:10px;margin-bottom:8px;">
-                        <div style="flex:1;background:rgba(27,94,32,0.2);padding:8px;border-radius:4px;border-left:2px solid #66bb6a;">
-                            <div style="color:#66bb6a;font-size:11px;font-weight:bold;margin-bottom:4px;">🦊 CGO (增长)</div>
-                            <div style="color:#c8e6c9;font-size:11px;line-height:1.3;font-style:italic;">"{bull_say}"</div>
-                        </div>
-                        <div style="flex:1;background:rgba(183,28,28,0.2);padding:8px;border-radius:4px;border-left:2px solid #ef5350;">
-                            <div style="color:#ef5350;font-size:11px;font-weight:bold;margin-bottom:4px;">🐻 CRO (风控)</div>
-                            <div style="color:#ffcdd2;font-size:11px;line-height:1.3;font-style:italic;">"{bear_say}"</div>
-                        </div>
-                    </div>
-                    <div style="background:linear-gradient(90deg, rgba(255,183,77,0.1) 0%, rgba(255,183,77,0.05) 100%);padding:10px;border-radius:4px;border:1px solid rgba(255,183,77,0.3);position:relative;">
-                        <div style="display:flex;justify-content:space-between;margin-bottom:4px;">
-                            <div style="color:#ffb74d;font-size:12px;font-weight:bold;">⚖️ CIO 终审 (华尔街视角)</div>
-                            <div style="color:{adj_color};font-size:11px;font-weight:bold;">修正: {adj:+d}</div>
-                        </div>
-                        <div style="color:#fff3e0;font-size:12px;line-height:1.4;">{cio_say}</div>
-                    </div>
-                </div>
-                """
-            else:
-                 committee_html = f"<div style='color:#f44336;font-size:12px;margin-top:10px;'>⚠️ AI 未生成有效辩论 (API Error)</div>"
-
-            # --- 硬指标 ---
-            vol_ratio = tech.get('risk_factors', {}).get('vol_ratio', 0)
-            rsi = tech.get('rsi', 0)
-            macd_trend = tech.get('macd', {}).get('trend', 'N/A')
-            
-            # 交易动作颜色
-            act_html = ""
-            if r['action'] == "买入":
-                act_html = f"<span style='color:#ff8a80;font-weight:bold;font-size:14px;'>+{r['amount']:,}</span>"
-            elif r['action'] == "卖出":
-                act_html = f"<span style='color:#a5d6a7;font-weight:bold;font-size:14px;'>SELL</span>"
-            else:
-                act_html = "<span style='color:#777;font-size:14px;'>HOLD</span>"
-
-            rows += f"""
-            <div style="background:{bg_gradient};border-left:4px solid {border_color};margin-bottom:15px;padding:15px;border-radius:6px;box-shadow:0 4px 10px rgba(0,0,0,0.6);border-top:1px solid #333;">
-                <div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:10px;">
-                    <div>
-                        <span style="font-size:18px;font-weight:bold;color:#f0e6d2;font-family:'Times New Roman',serif;">{r['name']}</span>
-                        <span style="margin-left:8px;">{badge_html}</span>
-                    </div>
-                    <div style="text-align:right;">
-                        <div style="color:#ffb74d;font-weight:bold;font-size:16px;text-shadow:0 0 5px rgba(255,183,77,0.3);">{score} 分</div>
-                        <div style="font-size:10px;color:#aaa;">{r['action']} | {act_html}</div>
-                    </div>
-                </div>
-                
-                {profit_html}
+def process_fund(fund, config, fetcher, risk_ctrl, analyst, tracker, val_engine, macro_news, volatility, prepared=None, checkpoint=None):
+    # 断点续跑: 当日已完成的基金直接读回结果，不再抓数据、调 LLM、记账
+    stage = checkpoint.fund_stage(fund['code']) if checkpoint else None
+    saved = checkpoint.load(stage) if checkpoint else None
+    if saved is not None:
+        logger.info(f"💾 [断点续跑] {fund['name']} 复用当日结果")
+        if analyst: analyst.restore_headlines(saved['news'], saved['fresh'])
+        return saved['res'], saved['news']
 
-                <div style="background:rgba(0,0,0,0.3);padding:6px 10px;border-radius:4px;margin-bottom:10px;display:flex;align-items:center;border-left:2px solid {border_color};">
-                    <span style="font-size:11px;color:#aaa;margin-right:8px;">🛑 铁腕风控:</span>
-                    <span style="font-size:11px;color:#fff;font-weight:bold;">{risk_msg}</span>
-                </div>
+    # 单只基金的时间预算: 上游挂掉时限制尾部延迟
+    with fund_deadline(config['global'].get('retry', {}).get('fund_budget')):
+        res, news = _process_fund(fund, config, fetcher, risk_ctrl, analyst, tracker, val_engine, macro_news, volatility, prepared)
+    if checkpoint and res and not is_fallback(res):
+        fresh = [n for n in news if analyst and n in analyst.fresh_headlines]
+        checkpoint.save(stage, {"res": res, "news": news, "fresh": fresh})
+    return res, news
 
-                <div style="display:grid;grid-template-columns:repeat(4, 1fr);gap:5px;font-size:11px;color:#bdbdbd;font-family:'Courier New',monospace;margin-bottom:8px;">
-                    <span>RSI: {rsi}</span>
-                    <span>MACD: {macd_trend}</span>
-                    <span>VR: {vol_ratio}</span>
-                    <span>Wkly: {tech.get('trend_weekly','-')}</span>
-                </div>
-                
-                <div style="margin-top:5px;margin-bottom:5px;">{render_dots(r.get('history', []))}</div>
-                
-                {committee_html}
-            </div>
-            """
-        except Exception as e:
-            logger.error(f"渲染卡片失败 {r.get('name')}: {e}")
-
-    return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><style>
-        body {{ background: #0a0a0a; color: #f0e6d2; font-family: 'Segoe UI', 'Microsoft YaHei', sans-serif; max-width: 660px; margin: 0 auto; padding: 20px; }}
-        .header {{ text-align: center; border-bottom: 2px solid #333; padding-bottom: 20px; margin-bottom: 25px; }}
-        .title {{ color: #ffb74d; margin: 0; font-size: 32px; font-weight: 800; font-family: 'Times New Roman', serif; letter-spacing: 2px; }}
-        .subtitle {{ font-size: 11px; color: #888; margin-top: 8px; text-transform: uppercase; letter-spacing: 1px; }}
-        .radar-panel {{ background: #111; border: 1px solid #333; border-radius: 4px; padding: 15px; margin-bottom: 25px; }}
-        .radar-title {{ font-size: 14px; color: #ffb74d; font-weight: bold; margin-bottom: 12px; border-bottom: 1px solid #444; padding-bottom: 6px; letter-spacing: 1px; }}
-        .cio-section {{ background: linear-gradient(145deg, #1a0505, #2b0b0b); border: 1px solid #5c1818; border-left: 4px solid #d32f2f; padding: 20px; margin-bottom: 20px; border-radius: 2px; box-shadow: 0 4px 10px rgba(0,0,0,0.3); }}
-        .cio-section p, .cio-section div, .cio-section h3 {{ color: #ffffff !important; line-height: 1.6; }}
-        .advisor-section {{ background: #0f0f0f; border: 1px solid #d4af37; border-left: 4px solid #ffd700; padding: 20px; margin-bottom: 30px; border-radius: 4px; box-shadow: 0 0 10px rgba(212, 175, 55, 0.2); }}
-        .advisor-section * {{ color: #ffffff !important; line-height: 1.6; font-family: 'Georgia', serif; }}
-        .footer {{ text-align: center; font-size: 10px; color: #444; margin-top: 40px; }}
-    </style></head><body>
-        <div class="header">
-            <h1 class="title">XUANTIE V15</h1>
-            <div class="subtitle">IRON FIST RISK CONTROL | VOLATILITY: {volatility:.2%}</div>
-        </div>
-        
-        <div class="radar-panel">
-            <div class="radar-title">📡 V15 全球情报雷达 (双源融合)</div>
-            {news_html}
-        </div>
-
-        <div class="cio-section">
-            <div style="font-size:16px;font-weight:bold;margin-bottom:15px;color:#eee;text-transform:uppercase;">🛑 CIO 战略审计 (V15)</div>
-            {cio_html}
-        </div>
-
-        <div class="advisor-section">
-            <div style="font-size:16px;font-weight:bold;margin-bottom:15px;color:#ffd700;">🗡️ 玄铁先生复盘</div>
-            {advisor_html}
-        </div>
-
-        {rows}
-        <div class="footer">EST. 2026 | POWERED BY IRON FIST ALGORITHM</div>
-    </body></html>"""
-
-def process_fund(fund, config, fetcher, risk_ctrl, analyst, tracker, val_engine, macro_news, volatility):
+def _process_fund(fund, config, fetcher, risk_ctrl, analyst, tracker, val_engine, macro_news, volatility, prepared=None):
     try:
         logger.info(f"⚔️ [V15处理] 启动分析 {fund['name']}...")
         
-        # 1. 获取数据
-        df = fetcher.get_fund_history(fund['code'])
-        if df is None: return None, []
+        if prepared is not None:
+            # 1~3 已在进程池中基于共享行情面板完成
+            tech, risk_assessment = prepared
+        else:
+            # 1. 获取数据
+            df = fetcher.get_fund_history(fund['code'])
+            if df is None: return None, []
 
-        # 2. 技术分析
-        tech = TechnicalAnalyzer.calculate_indicators(df)
-        
-        # 3. 硬风控 (Iron Fist)
-        risk_assessment = risk_ctrl.analyze_risk(fund['name'], tech, volatility)
+            # 2. 技术分析
+            tech = TechnicalAnalyzer.calculate_indicators(df)
+            
+            # 3. 硬风控 (Iron Fist)
+            risk_assessment = risk_ctrl.analyze_risk(fund['name'], tech, volatility)
         fuse_level = risk_assessment['fuse_level']
         max_pos_ratio = risk_assessment['max_position_ratio']
         
@@ -246,11 +86,12 @@ def process_fund(fund, config, fetcher, risk_ctrl, analyst, tracker, val_engine,
             news = analyst.fetch_news_titles(keyword)
             try:
                 # 传入 risk_assessment，让 AI 知道风控状态
-                ai_res = analyst.analyze_fund_v5(fund['name'], tech, macro_news, news, risk_assessment)
+                # 新情报优先，按 token 预算装箱后喂给 LLM
+                ai_res = analyst.analyze_fund_v5(fund['name'], tech, macro_news, analyst.new_only(news), risk_assessment)
             except Exception as e:
                 logger.error(f"AI分析失败 {fund['name']}: {e}")
                 # 即使失败，也要返回基础数据，保证卡片能渲染
-                ai_res = {"bull_say": "API Error", "bear_say": "API Error", "comment": "手动检查", "adjustment": 0}
+                ai_res = dict(AI_FALLBACK)
         
         # 6. 决策收敛
         base_score = tech.get('quant_score', 50)
@@ -274,23 +115,18 @@ def process_fund(fund, config, fetcher, risk_ctrl, analyst, tracker, val_engine,
         elif final_score <= 30 or fuse_level >= 3:
             action = "卖出"
             
-        # 8. 记录信号与交易
-        with tracker.lock:
-            tracker.record_signal(fund['code'], action)
-            if amount > 0:
-                tracker.add_trade(fund['code'], fund['name'], amount, tech['price'])
-            # 增加 history 用于 UI 点阵渲染
-            signal_history = tracker.get_signal_history(fund['code'])
-
+        # 8. 信号与交易在组合风控之后统一记账 (见 apply_decisions)
         res = {
             "name": fund['name'],
+            "code": fund['code'],
             "score": final_score,
             "action": action,
             "amount": amount,
             "risk": risk_assessment,
             "ai": ai_res,
             "tech": tech,
-            "history": signal_history, # 传给 UI
+            "source": fetcher.history_source.get(fund['code']),
+            "history": [], # 记账后填充，传给 UI
             "position_info": pos_info  # 传给 UI
         }
         return res, news
@@ -298,53 +134,288 @@ def process_fund(fund, config, fetcher, risk_ctrl, analyst, tracker, val_engine,
         logger.error(f"处理基金 {fund['name']} 严重错误: {e}")
         return None, []
 
-def main():
+def apply_decisions(results, tracker, portfolio, run_date):
+    """
+    [V15 组合风控] 同日拟买入先按相关性簇与 max_daily_invest 压缩，再记录信号与交易。
+    trade_id = 日期:代码，断点续跑重复执行时不会重复加仓。
+    """
+    buys = {r['code']: r['amount'] for r in results if r['action'] == "买入" and r['amount'] > 0}
+    capped, notes = portfolio.cap_buys(buys)
+    for r in results:
+        code = r['code']
+        if code in notes:
+            logger.warning(f"📐 [组合风控] {r['name']} 买入 {r['amount']} -> {capped[code]} 元: {notes[code]}")
+            r['amount'] = capped[code]
+            r['risk']['risk_msg'] = f"{r['risk']['risk_msg']}；{notes[code]}"
+            if r['amount'] == 0: r['action'] = "观望"
+        with tracker.lock:
+            tracker.record_signal(code, r['action'])
+            if r['amount'] > 0:
+                tracker.add_trade(code, r['name'], r['amount'], r['tech']['price'], trade_id=f"{run_date}:{code}")
+            # 增加 history 用于 UI 点阵渲染
+            r['history'] = tracker.get_signal_history(code)
+
+    # 组合层面的波动 / VaR / 风险贡献 (持仓按最新价估值)
+    prices = {r['code']: r['tech']['price'] for r in results}
+    with tracker.lock:
+        positions = dict(tracker.data['positions'])
+    values = {code: pos['shares'] * prices.get(code, pos['cost']) for code, pos in positions.items() if pos['shares'] > 0}
+    report = portfolio.assess(values)
+    if report is None: return None
+    logger.info(f"📐 [组合风控]\n{portfolio.table(report, {r['code']: r['name'] for r in results})}")
+    return f"组合: 市值{report['value']:.0f} 日波动{report['vol_pct']:.2%} VaR{portfolio.var_confidence:.0%} {report['var_pct']:.2%}"
+
+def fetch_increment(fetcher, code, base, complete):
+    """只下载 complete 之后缺的K线，拼到缓存的已收盘K线后面"""
+    df = fetcher.get_fund_history(code, start=complete + timedelta(days=1))
+    if df is None: return None
+    merged = pd.concat([base, df[df.index > pd.Timestamp(complete)]])
+    return merged[~merged.index.duplicated(keep='last')].tail(max(fetcher.planner.bars, len(base)))
+
+def fetch_histories(config, fetcher, funds):
+    """
+    抓取阶段: 并发下载日K线。
+    启用共享行情面板 (price_store.enabled) 时以上一次的面板为缓存:
+    已收盘K线齐全的基金直接复用，缺少的只按缺口日期增量下载；未启用时每次全量抓取规划长度。
+    """
+    store_cfg = config['global'].get('price_store', {})
+    calendar = get_calendar()
+    now = get_beijing_time()
+
+    histories = {}
+    to_fetch = []   # (fund, 缓存的已收盘K线, 缓存截至日期)
+    cached = PriceStore.open_existing(store_cfg.get('path', 'cache/price_panel')) if store_cfg.get('enabled', False) else None
+    for f in funds:
+        df = cached.get_history(f['code']) if cached else None
+        if df is not None and not df.empty:
+            complete = cached.complete_through(f['code'])
+            missing = calendar.bars_since(complete, now)
+            df = df[df.index <= pd.Timestamp(complete)].copy()
+            if missing == 0:
+                histories[f['code']] = fetcher.stitch_realtime(f['code'], df)
+                continue
+            if missing < fetcher.planner.bars:
+                logger.info(f"📦 {f['name']} 缓存缺 {missing} 根K线，增量补齐")
+                to_fetch.append((f, df, complete))
+                continue
+            logger.info(f"📦 {f['name']} 缓存缺 {missing} 根K线，重新抓取")
+        to_fetch.append((f, None, None))
+    if cached is not None:
+        logger.info(f"📦 [行情面板] 复用缓存 {len(histories)} 只，需抓取 {len(to_fetch)} 只")
+    del cached
+
+    # 抓取已移出 process_fund，单只基金的时间预算在这里同样生效
+    fund_budget = config['global'].get('retry', {}).get('fund_budget')
+    def fetch(f, base, complete):
+        with fund_deadline(fund_budget):
+            if base is not None: return fetch_increment(fetcher, f['code'], base, complete)
+            return fetcher.get_fund_history(f['code'])
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {executor.submit(fetch, f, base, complete): f for f, base, complete in to_fetch}
+        for future in as_completed(futures):
+            code = futures[future]['code']
+            try:
+                df = future.result()
+                if df is not None: histories[code] = df
+            except Exception as e:
+                logger.error(f"行情抓取失败 {code}: {e}")
+    return histories
+
+def analyze_histories(config, funds, histories, risk_ctrl, volatility):
+    """
+    指标 + 硬风控 (依赖波动率): 返回 {code: (tech, risk)}
+    启用共享行情面板时写入 memmap 面板，由进程池并行计算；否则在当前线程逐只计算
+    """
+    store_cfg = config['global'].get('price_store', {})
+    funds = [f for f in funds if f['code'] in histories]
+    if store_cfg.get('enabled', False):
+        store = PriceStore(store_cfg.get('path', 'cache/price_panel'))
+        calendar = get_calendar()
+        if not store.write(histories, complete_through=calendar.last_complete_day(get_beijing_time())): return {}
+        return analyze_in_pool(store.path, funds, config, volatility, max_workers=store_cfg.get('workers', 4))
+    prepared = {}
+    for f in funds:
+        try:
+            tech = TechnicalAnalyzer.calculate_indicators(histories[f['code']])
+            prepared[f['code']] = (tech, risk_ctrl.analyze_risk(f['name'], tech, volatility))
+        except Exception as e:
+            logger.error(f"指标计算失败 {f['name']}: {e}")
+    return prepared
+
+def main(force=False, resume=True):
     logger.info(">>> 🚀 玄铁量化 V15.0 (Iron Fist) 启动...")
     config = load_config()
+
+    # 非交易日行情不变，不再下载数据、调用 LLM
+    today = get_beijing_time()
+    if not force and not get_calendar().is_trading_day(today):
+        logger.info(f"📅 {today:%Y-%m-%d} 非交易日，跳过本次运行 (--force 强制执行)")
+        return
+    configure_retry(config)
     
-    fetcher = DataFetcher()
+    scoreboard = SourceScoreboard()
+    fetcher = DataFetcher(config, scoreboard)
     risk_ctrl = RiskController(config)
-    analyst = NewsAnalyst()
+    news_cfg = config['global'].get('news', {})
+    run_date = f"{today:%Y-%m-%d}"
+    # 指纹批次按交易日: 同日断点续跑 / 重跑时，首次尝试见过的标题仍算 "本次新增"
+    analyst = NewsAnalyst(scoreboard, HeadlineDeduper(run_id=run_date, capacity=news_cfg.get('seen_capacity', 5000),
+                                                      max_distance=news_cfg.get('near_distance', 3),
+                                                      min_jaccard=news_cfg.get('min_jaccard', 0.5)), config)
     tracker = PortfolioTracker()
+    portfolio = PortfolioRisk(config)
+    archive_cfg = config['global'].get('archive', {})
+    archive = RunArchive(archive_cfg.get('path', 'archive/runs')) if archive_cfg.get('enabled', True) else None
     val_engine = ValuationEngine()
-    
-    volatility = fetcher.get_market_volatility()
-    macro_news = analyst.fetch_news_titles("宏观 A股 美联储")
-    # 构造宏观字符串，用于 AI 上下文
-    macro_str = " | ".join([n.split(']')[-1] for n in macro_news[:5]])
-    
-    results = []
-    all_news = []
-    all_news.extend(macro_news)
-    
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        futures = {executor.submit(process_fund, f, config, fetcher, risk_ctrl, analyst, tracker, val_engine, macro_str, volatility): f for f in config['funds']}
-        
-        for future in as_completed(futures):
-            res, fund_news = future.result()
-            if res:
-                results.append(res)
-                all_news.extend(fund_news)
+    # 邮件队列先启动: 上次遗留的报告在本次运行期间补发
+    mailer = MailQueue.from_env().start()
+
+    ckpt_cfg = config['global'].get('checkpoint', {})
+    checkpoint = RunCheckpoint(ckpt_cfg.get('dir', 'checkpoints'), run_date=run_date,
+                               keep_days=ckpt_cfg.get('keep_days', 7), enabled=ckpt_cfg.get('enabled', True))
+    if not resume: checkpoint.clear()
+    if checkpoint.has("report"):
+        logger.info("💾 [断点续跑] 当日报告已投递，无需重跑 (--no-resume 强制重跑)")
+        mailer.close()
+        return
 
-    # 生成总结报告
-    if results:
+    funds = config['funds']
+    pending = [f for f in funds if not checkpoint.has(checkpoint.fund_stage(f['code']))]
+    degraded = []  # 本次用了兜底值的阶段: 不写检查点，报告也不标记为已完成
+
+    def stage_volatility():
+        try:
+            return checkpoint.stage("volatility", lambda: fetcher.get_market_volatility(fallback=None))
+        except Exception as e:
+            logger.warning(f"🌊 市场波动率获取失败，按 1.5% 兜底: {e}")
+            degraded.append("volatility")
+            return 0.015
+
+    # --- 阶段图: 波动率 / 宏观情报 / 行情抓取 三者互不依赖，并发执行 ---
+    def stage_macro():
+        def fetch_macro():
+            news = analyst.fetch_news_titles("宏观 A股 美联储")
+            # 情报源全部失败时不落盘: 网络恢复后同日重跑还能拿到宏观情报
+            if not news: raise ValueError("宏观情报源均无数据")
+            return {"news": news, "fresh": [n for n in news if n in analyst.fresh_headlines]}
+        try:
+            macro = checkpoint.stage("macro", fetch_macro)
+        except Exception as e:
+            logger.warning(f"📰 宏观情报获取失败，本次按无新增处理: {e}")
+            degraded.append("macro")
+            macro = {"news": [], "fresh": []}
+        analyst.restore_headlines(macro['news'], macro['fresh'])
+        # 构造宏观字符串，用于 AI 上下文
+        macro['text'] = " | ".join([n.split(']')[-1] for n in analyst.new_only(macro['news'])[:5]]) or "无新增宏观情报"
+        return macro
+
+    def stage_funds(analyze, macro, volatility):
+        # 当日已有检查点的基金照常进入 (直接读回)；待处理的只保留抓取成功的
+        todo = [f for f in funds if f not in pending or f['code'] in analyze]
+        results, fund_news = [], []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {executor.submit(process_fund, f, config, fetcher, risk_ctrl, analyst, tracker, val_engine, macro['text'], volatility, analyze.get(f['code']), checkpoint): f for f in todo}
+            for future in as_completed(futures):
+                res, news = future.result()
+                if res:
+                    results.append(res)
+                    fund_news.extend(news)
+        return {"results": results, "news": fund_news}
+
+    def stage_decisions(funds, prices):
+        results = funds['results']
+        portfolio.update(prices, [f['code'] for f in config['funds']], get_calendar().last_complete_day(get_beijing_time()))
+        portfolio_line = apply_decisions(results, tracker, portfolio, checkpoint.run_date)
+        # 逐基金结果入档 (同日重跑以最新一次为准)
+        if archive is not None: archive.append(results, checkpoint.run_date)
         # 简单的总结文本用于生成 CIO 和 顾问报告
         summary_text = "\n".join([f"{r['name']}: {r['action']} (分:{r['score']} 熔断Lv:{r['risk']['fuse_level']})" for r in results])
-        
+        if portfolio_line: summary_text += "\n" + portfolio_line
+        return {"results": results, "news": funds['news'], "summary": summary_text}
+
+    def stage_cio(decisions):
+        if not decisions['results']: return None
         try:
-            cio_html = analyst.review_report(summary_text)
-            advisor_html = analyst.advisor_review(summary_text, macro_str)
+            return checkpoint.stage("cio", lambda: analyst.review_report(decisions['summary']))
         except Exception as e:
-            logger.error(f"生成汇总失败: {e}")
-            cio_html = "<p>CIO 忙碌中...</p>"
-            advisor_html = "<p>玄铁先生闭关中...</p>"
-            
-        html_report = render_html_report_v15_full(all_news, results, cio_html, advisor_html, volatility)
-        send_email("玄铁 V15 决策报告 (Iron Fist)", html_report)
-    else:
-        logger.warning("无有效结果生成")
-        
+            logger.error(f"生成 CIO 审计失败: {e}")
+            degraded.append("cio")
+            return "<p>CIO 审计生成失败</p>"
+
+    def stage_advisor(decisions, macro):
+        if not decisions['results']: return None
+        try:
+            return checkpoint.stage("advisor", lambda: analyst.advisor_review(decisions['summary'], macro['text']))
+        except Exception as e:
+            logger.error(f"生成顾问复盘失败: {e}")
+            degraded.append("advisor")
+            return "<p>玄铁先生闭关中</p>"
+
+    def stage_report(decisions, macro, cio, advisor, volatility):
+        results = decisions['results']
+        if not results:
+            logger.warning("无有效结果生成")
+            return False
+        report_cfg = config['global'].get('report', {})
+        html_report = render_html_report_v15_full(macro['news'] + decisions['news'], results, cio, advisor, volatility,
+                                                  budget_bytes=report_cfg.get('budget_bytes'),
+                                                  news_limit=report_cfg.get('news_limit', 18),
+                                                  fresh=analyst.fresh_headlines, archive=archive)
+        # 入队即落盘到 spool，之后的崩溃也不会丢报告
+        mailer.enqueue("玄铁 V15 决策报告 (Iron Fist)", html_report)
+        missing = degraded + [r['code'] for r in results if is_fallback(r)]
+        if missing:
+            # 报告照发，但不落 report 检查点: 同日重跑只补算失败的阶段，再发一份完整报告
+            logger.warning(f"💾 [断点续跑] 以下阶段使用了兜底结果，重跑时将重新计算: {', '.join(missing)}")
+            return True
+        checkpoint.save("report", {"enqueued_at": get_beijing_time().isoformat(), "funds": len(results)})
+        return True
+
+    graph = StageGraph(max_workers=4)
+    graph.add("volatility", stage_volatility)
+    graph.add("macro", stage_macro)
+    graph.add("prices", lambda: fetch_histories(config, fetcher, pending))
+    graph.add("analyze", lambda prices, volatility: analyze_histories(config, pending, prices, risk_ctrl, volatility),
+              deps=("prices", "volatility"))
+    graph.add("funds", stage_funds, deps=("analyze", "macro", "volatility"))
+    graph.add("decisions", stage_decisions, deps=("funds", "prices"))
+    graph.add("cio", stage_cio, deps=("decisions",))
+    graph.add("advisor", stage_advisor, deps=("decisions", "macro"))
+    graph.add("report", stage_report, deps=("decisions", "macro", "cio", "advisor", "volatility"))
+    try:
+        graph.run()
+    finally:
+        logger.info(f"🧩 [阶段耗时]\n{graph.timing_table()}")
+        mailer.close()
+        scoreboard.save()
+        analyst.deduper.save()
+    logger.info(f"🧮 [LLM 账本]\n{analyst.ledger.table()}")
+    logger.info(f"📊 [数据源健康榜]\n{scoreboard.table()}")
     logger.info("✅ 任务完成")
 
+def run_daemon():
+    config = load_config()
+    risk_ctrl = RiskController(config)
+    mailer = MailQueue.from_env().start()
+    scoreboard = SourceScoreboard()
+    daemon = IntradayDaemon(config, DataFetcher(config, scoreboard), risk_ctrl)
+    alerts = FuseAlertEngine(config, risk_ctrl, AlertNotifier(config, mailer))
+    daemon.add_tick_handler(alerts.on_tick)
+    try:
+        daemon.run()
+    finally:
+        alerts.close()
+        mailer.close()
+        scoreboard.save()
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="玄铁量化 V15")
+    parser.add_argument("--daemon", action="store_true", help="盘中守护模式: 按间隔轮询快照并实时重跑风控")
+    parser.add_argument("--force", action="store_true", help="非交易日也强制运行")
+    parser.add_argument("--no-resume", action="store_true", help="丢弃当日检查点，从头重跑")
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon()
+    else:
+        main(force=args.force, resume=not args.no_resume)
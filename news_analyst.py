@@ -2,11 +2,14 @@ import requests
 import json
 import os
 import re
+import time
 from datetime import datetime
-from utils import logger, retry
+from utils import logger, retry, get_breaker, budget_timeout, CircuitOpenError
+from news_dedup import HeadlineDeduper, dedup_headlines
+from llm_budget import TokenLedger, estimate_tokens, truncate_tokens, pack_headlines
 
 class NewsAnalyst:
-    def __init__(self):
+    def __init__(self, scoreboard=None, deduper=None, config=None):
         self.api_key = os.getenv("LLM_API_KEY")
         self.base_url = os.getenv("LLM_BASE_URL")
         self.model = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
@@ -19,6 +22,16 @@ class NewsAnalyst:
             "Referer": "https://www.cls.cn/telegraph",
             "Origin": "https://www.cls.cn"
         }
+        self.scoreboard = scoreboard
+        self.deduper = deduper or HeadlineDeduper(filepath=None)
+        self.fresh_headlines = set()  # 本次运行首次出现的标题
+        llm_cfg = (config or {}).get('global', {}).get('llm', {})
+        self.news_token_budget = llm_cfg.get('news_token_budget', 300)
+        self.macro_token_budget = llm_cfg.get('macro_token_budget', 200)
+        self.summary_token_budget = llm_cfg.get('summary_token_budget', 1500)
+        self.fund_max_tokens = llm_cfg.get('fund_max_tokens', 1000)
+        self.summary_max_tokens = llm_cfg.get('summary_max_tokens', 800)
+        self.ledger = TokenLedger()
 
     def _format_short_time(self, time_str):
         try:
@@ -34,6 +47,8 @@ class NewsAnalyst:
 
     def _fetch_eastmoney_news(self):
         # Akshare 兜底获取
+        breaker = get_breaker("news.eastmoney")
+        if not breaker.allow(): return []
         try:
             import akshare as ak
             df = ak.stock_news_em(symbol="要闻")
@@ -41,17 +56,22 @@ class NewsAnalyst:
             for _, row in df.iterrows():
                 title = str(row.get('title', ''))[:40]
                 raw_list.append(f"[{str(row.get('public_time',''))[5:16]}] (东财) {title}")
+            breaker.record(True)
             return raw_list[:5]
         except:
+            breaker.record(False)
             return []
 
     def _fetch_cls_telegraph(self):
         # 财联社原生直连
         raw_list = []
+        breaker = get_breaker("news.cls")
+        if not breaker.allow(): return raw_list
         url = "https://www.cls.cn/nodeapi/telegraphList"
         params = {"rn": 20, "sv": 7755}
         try:
             resp = requests.get(url, headers=self.cls_headers, params=params, timeout=5)
+            breaker.record(resp.status_code == 200)
             if resp.status_code == 200:
                 data = resp.json()
                 if "data" in data and "roll_data" in data["data"]:
@@ -62,30 +82,53 @@ class NewsAnalyst:
                         time_str = self._format_short_time(item.get("ctime", 0))
                         raw_list.append(f"[{time_str}] (财社) {txt}")
         except Exception as e:
+            breaker.record(False)
             logger.warning(f"财社源微瑕: {e}")
         return raw_list
 
+    def _news_sources(self):
+        sources = {"cls": self._fetch_cls_telegraph, "eastmoney": self._fetch_eastmoney_news}
+        names = list(sources)
+        # 按健康度排序，默认顺序: 财社 -> 东财
+        if self.scoreboard is not None:
+            names = self.scoreboard.order("news", names)
+        return [(name, sources[name]) for name in names]
+
     @retry(retries=2, delay=2)
-    def fetch_news_titles(self, keywords_str):
-        l1 = self._fetch_cls_telegraph()
-        l2 = self._fetch_eastmoney_news()
-        all_n = l1 + l2
-        
-        hits = []
+    def fetch_news_titles(self, keywords_str, limit=8):
         keys = keywords_str.split()
-        seen = set()
+        lists = []
+        # 按健康度顺序逐个尝试，命中已够 limit 条就不再请求后面的源
+        for name, fetch in self._news_sources():
+            # 熔断跳过的源没有真正发请求，不计入健康榜 (否则 ~0 延迟会拉低其 EWMA)
+            if not get_breaker(f"news.{name}").allow(): continue
+            start = time.monotonic()
+            items = fetch()
+            if self.scoreboard is not None:
+                self.scoreboard.record(f"news.{name}", bool(items), time.monotonic() - start)
+            lists.append(items)
+            merged = dedup_headlines([n for l in lists for n in l])
+            if sum(1 for n in merged if any(k in n for k in keys)) >= limit: break
+        all_n = [n for l in lists for n in l]
         
-        for n in all_n:
-            # 简单去重
-            clean_n = n.split(']')[-1].strip()
-            if clean_n in seen: continue
-            seen.add(clean_n)
-            
-            if any(k in n for k in keys):
-                hits.append(n)
+        # SimHash 近似去重 (跨源同一事件只留一条)，并登记本次运行新增的标题
+        unique, fresh = self.deduper.dedup(all_n)
+        self.fresh_headlines.update(fresh)
         
-        # 兜底：如果没有命中，返回财社最新的3条
-        return hits[:8] if hits else l1[:3]
+        hits = [n for n in unique if any(k in n for k in keys)]
+        
+        # 兜底：如果没有命中，返回排序最靠前的有效源最新的3条
+        fallback = next((l for l in lists if l), [])
+        return hits[:limit] if hits else fallback[:3]
+
+    def restore_headlines(self, news, fresh):
+        """断点续跑读回的情报: 补登记到指纹库，并恢复 "本次新增" 标记"""
+        self.deduper.dedup(news)
+        self.fresh_headlines.update(fresh)
+
+    def new_only(self, news):
+        """只保留上次运行之后新出现的标题，旧闻不再喂给 LLM"""
+        return [n for n in news if n in self.fresh_headlines]
 
     def _clean_json(self, text):
         try:
@@ -93,7 +136,7 @@ class NewsAnalyst:
             return match.group(0) if match else "{}"
         except: return "{}"
 
-    @retry(retries=2, delay=2)
+    @retry(retries=2, delay=2, breaker="llm")
     def analyze_fund_v5(self, fund_name, tech, macro, news, risk):
         # 准备数据
         fuse = risk['fuse_level']
@@ -112,6 +155,10 @@ class NewsAnalyst:
         vol_ratio = tech.get('risk_factors', {}).get('vol_ratio', 1.0)
         vol_str = "放量" if vol_ratio > 1.2 else ("缩量" if vol_ratio < 0.8 else "温和")
 
+        # 情报按优先级装箱到 token 预算内 (新增 > 突发 > 其余)
+        packed = pack_headlines(news, self.news_token_budget, self.fresh_headlines)
+        news_block = "\n".join(f"          · {n}" for n in packed) or "          · 无新增情报"
+
         # 完整 Prompt (未删减)
         prompt = f"""
         你现在是【玄铁联邦投委会 V15】。
@@ -131,8 +178,9 @@ class NewsAnalyst:
         - 量能状态: {vol_str} (VR:{vol_ratio})
 
         📰 **自查情报**:
-        - 宏观: {macro[:300]}
-        - 本地新闻: {str(news)[:400]}
+        - 宏观: {truncate_tokens(macro, self.macro_token_budget)}
+        - 本地新闻:
+{news_block}
 
         --- 🏛️ 参会人员与人设 ---
 
@@ -163,15 +211,44 @@ class NewsAnalyst:
         }}
         """
         
+        content = self._chat("analyze_fund", prompt, max_tokens=self.fund_max_tokens, temperature=0.35, timeout=60)
+        return json.loads(self._clean_json(content))
+
+    def _chat(self, name, prompt, max_tokens, temperature=None, timeout=60):
+        """统一的 LLM 调用: 记录 prompt/completion token 与耗时"""
         payload = {
             "model": self.model,
             "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.35,
-            "max_tokens": 1000
+            "max_tokens": max_tokens
         }
-        
-        resp = requests.post(f"{self.base_url}/chat/completions", headers=self.headers, json=payload, timeout=60)
-        return json.loads(self._clean_json(resp.json()['choices'][0]['message']['content']))
+        if temperature is not None: payload["temperature"] = temperature
+        start = time.monotonic()
+        resp = requests.post(f"{self.base_url}/chat/completions", headers=self.headers, json=payload, timeout=budget_timeout(timeout))
+        resp.raise_for_status()
+        data = resp.json()
+        content = data['choices'][0]['message']['content']
+        usage = data.get('usage') or {}
+        estimated = 'prompt_tokens' not in usage
+        self.ledger.record(
+            name,
+            usage.get('prompt_tokens', estimate_tokens(prompt)),
+            usage.get('completion_tokens', estimate_tokens(content)),
+            time.monotonic() - start,
+            estimated
+        )
+        return content
+
+    def _post_summary(self, name, prompt):
+        """汇总类调用: LLM 熔断时直接放弃，超时受整次运行预算约束"""
+        breaker = get_breaker("llm")
+        if not breaker.allow(): raise CircuitOpenError("llm")
+        try:
+            content = self._chat(name, prompt, max_tokens=self.summary_max_tokens, timeout=120)
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(True)
+        return content
 
     # --- 完整的 CIO 战略审计 ---
     @retry(retries=2, delay=2)
@@ -181,7 +258,7 @@ class NewsAnalyst:
         内容要求：言简意赅，直击痛点，不要废话。
         
         汇总数据:
-        {report_text}
+        {truncate_tokens(report_text, self.summary_token_budget)}
         
         输出模板:
         <div class="cio-section">
@@ -193,16 +270,8 @@ class NewsAnalyst:
             <p>(给出总仓位建议)</p>
         </div>
         """
-        payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        try:
-            resp = requests.post(f"{self.base_url}/chat/completions", headers=self.headers, json=payload)
-            clean = self._clean_html(resp.json()['choices'][0]['message']['content'])
-            return clean
-        except:
-            return "<p>CIO 审计生成失败</p>"
+        # 失败直接抛出: 由调用方降级展示，降级内容不写入检查点
+        return self._clean_html(self._post_summary("review_report", prompt))
 
     # --- 完整的玄铁先生复盘 ---
     @retry(retries=2, delay=2)
@@ -212,8 +281,8 @@ class NewsAnalyst:
         请写一段【场外实战复盘】 (HTML)。
         风格：使用短句，富有哲理，关注周期与人性。
         
-        宏观: {macro_str[:200]}
-        决议: {report_text}
+        宏观: {truncate_tokens(macro_str, self.macro_token_budget)}
+        决议: {truncate_tokens(report_text, self.summary_token_budget)}
         
         输出模板:
         <div class="advisor-section">
@@ -222,16 +291,7 @@ class NewsAnalyst:
             <h4 style="color: #ffd700;">【断·进攻】</h4><p>...</p>
         </div>
         """
-        payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        try:
-            resp = requests.post(f"{self.base_url}/chat/completions", headers=self.headers, json=payload)
-            clean = self._clean_html(resp.json()['choices'][0]['message']['content'])
-            return clean
-        except:
-            return "<p>玄铁先生闭关中</p>"
+        return self._clean_html(self._post_summary("advisor_review", prompt))
             
     def _clean_html(self, text):
         text = text.replace("```html", "").replace("```", "").strip()
@@ -0,0 +1,148 @@
+import json
+import os
+import re
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from utils import logger
+
+FP_BITS = 64
+_PREFIX = re.compile(r'^\s*\[[^\]]*\]\s*(\([^)]*\)\s*)?')
+_NOISE = re.compile(r'[\W_]+', re.UNICODE)
+
+def headline_text(n):
+    """去掉 "[时间] (来源)" 前缀与标点，只保留正文"""
+    return _NOISE.sub('', _PREFIX.sub('', n))
+
+def simhash(text):
+    """字符二元组 SimHash (64 位)，对中文短标题的改写/增删字足够稳定"""
+    grams = [text[i:i + 2] for i in range(len(text) - 1)] or [text]
+    digests = b''.join(hashlib.blake2b(g.encode('utf-8'), digest_size=8).digest() for g in grams)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, FP_BITS)
+    votes = bits.sum(axis=0) * 2 > len(grams)
+    return int.from_bytes(np.packbits(votes).tobytes(), 'big')
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+# 方向相反的词对: 一条有、另一条没有时视为不同事件 (收涨 vs 收跌)
+POLARITY_PAIRS = [('涨', '跌'), ('升', '降'), ('增', '减'), ('多', '空'), ('买', '卖'), ('盈', '亏'), ('升值', '贬值'), ('扩', '缩')]
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+def bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+def same_story(a, b, min_jaccard=0.5):
+    """
+    SimHash 命中后的确认: 长度相近、字符二元组 Jaccard 足够高、
+    数字完全一致、涨跌等方向词一致，才算同一条新闻。
+    """
+    if min(len(a), len(b)) < 0.7 * max(len(a), len(b)): return False
+    if _NUMBER.findall(a) != _NUMBER.findall(b): return False
+    for x, y in POLARITY_PAIRS:
+        if (x in a, y in a) != (x in b, y in b): return False
+    ga, gb = bigrams(a), bigrams(b)
+    return len(ga & gb) / len(ga | gb) >= min_jaccard
+
+class HeadlineDeduper:
+    """
+    [V15 情报指纹库]
+    SimHash 指纹 + 分段索引: 汉明距离 <= max_distance 的两条标题，必有一段完全相同 (抽屉原理)，
+    因此每条标题只需查 max_distance+1 个桶。每个桶的期望候选数约为 capacity / 2^(64 // (max_distance+1))，
+    默认 max_distance=3 时每段 16 位，5000 条容量下每次查询平均不到 1 个候选；距离放宽会让桶变粗、候选线性增多。
+    SimHash 只负责召回，命中后还要经过 same_story 确认 (数字、涨跌方向词、二元组 Jaccard)，
+    避免 "收涨1.2%" 与 "收跌1.2%" 这类短标题被误并。
+    指纹按 LRU 保留 capacity 条并落盘 (连同正文，用于确认)，记录首次出现的运行批次，用于区分 "本次运行新增" 与 "旧闻"。
+    """
+    def __init__(self, filepath='news_seen.json', capacity=5000, max_distance=3, min_jaccard=0.5, run_id=None):
+        self.filepath = filepath
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.min_jaccard = min_jaccard
+        self.n_bands = max_distance + 1
+        self.band_bits = FP_BITS // self.n_bands
+        # 运行批次: 主流程传入交易日，同日多次运行共享同一批次；未指定时按进程启动时间
+        self.run_id = run_id or time.strftime('%Y%m%d%H%M%S')
+        self.entries = OrderedDict()  # fp -> 首次出现的 run_id
+        self.texts = {}               # fp -> 去前缀后的正文 (确认用)
+        self.bands = [dict() for _ in range(self.n_bands)]
+        self.lock = threading.Lock()
+        self._load()
+
+    def _band_keys(self, fp):
+        mask = (1 << self.band_bits) - 1
+        return [(fp >> (i * self.band_bits)) & mask for i in range(self.n_bands)]
+
+    def _add(self, fp, run_id, text=None):
+        self.entries[fp] = run_id
+        if text is not None: self.texts[fp] = text
+        for band, key in zip(self.bands, self._band_keys(fp)):
+            band.setdefault(key, set()).add(fp)
+        while len(self.entries) > self.capacity:
+            old, _ = self.entries.popitem(last=False)
+            self.texts.pop(old, None)
+            for band, key in zip(self.bands, self._band_keys(old)):
+                bucket = band.get(key)
+                if bucket is not None:
+                    bucket.discard(old)
+                    if not bucket: del band[key]
+
+    def _find(self, fp, text):
+        for band, key in zip(self.bands, self._band_keys(fp)):
+            for cand in band.get(key, ()):
+                if hamming(cand, fp) > self.max_distance: continue
+                known = self.texts.get(cand)
+                # 旧版指纹库没有正文，只能按汉明距离判定
+                if known is None or same_story(known, text, self.min_jaccard):
+                    return cand
+        return None
+
+    def _load(self):
+        if not self.filepath or not os.path.exists(self.filepath): return
+        try:
+            with open(self.filepath, 'r') as f:
+                data = json.load(f)
+            for entry in data.get('entries', []):
+                self._add(int(entry[0], 16), entry[1], entry[2] if len(entry) > 2 else None)
+        except Exception as e:
+            logger.warning(f"情报指纹库加载失败: {e}")
+
+    def save(self):
+        if not self.filepath: return
+        with self.lock:
+            entries = [[f"{fp:016x}", run_id, self.texts.get(fp)] for fp, run_id in self.entries.items()]
+        with open(self.filepath, 'w') as f:
+            json.dump({"run": self.run_id, "entries": entries}, f)
+
+    def observe(self, headline):
+        """
+        登记一条标题，返回 (fingerprint, is_new)
+        fingerprint: 命中近似重复时返回已有指纹，用于批内去重
+        is_new: 该标题 (或其近似版本) 是否在本次运行中首次出现
+        """
+        text = headline_text(headline)
+        fp = simhash(text)
+        with self.lock:
+            match = self._find(fp, text)
+            if match is None:
+                self._add(fp, self.run_id, text)
+                return fp, True
+            self.entries.move_to_end(match)
+            return match, self.entries[match] == self.run_id
+
+    def dedup(self, headlines):
+        """批内近似去重 (保持顺序)，同时登记到指纹库；返回 (unique, fresh)"""
+        unique, fresh, seen = [], set(), set()
+        for n in headlines:
+            fp, is_new = self.observe(n)
+            if fp in seen: continue
+            seen.add(fp)
+            unique.append(n)
+            if is_new: fresh.add(n)
+        return unique, fresh
+
+def dedup_headlines(headlines, max_distance=3):
+    """不落盘的一次性近似去重 (报告渲染用)"""
+    return HeadlineDeduper(filepath=None, capacity=max(len(headlines), 1), max_distance=max_distance).dedup(headlines)[0]
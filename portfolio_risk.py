@@ -0,0 +1,243 @@
+import os
+import numpy as np
+import pandas as pd
+from utils import logger
+
+def _join(*msgs):
+    return "；".join(m for m in msgs if m)
+
+class RollingCovariance:
+    """
+    [V15 滚动协方差]
+    维护最近 window 个交易日的日收益矩阵 R (日期 × 基金)，以及增量累加量:
+      S = Σ r_t (各基金收益和)，P = Σ r_t r_tᵀ (交叉乘积和)
+    每新增一天只做一次 O(N²) 的秩一更新 (新日加、最旧日减)，协方差 = (P - S Sᵀ / n) / (n - 1)，
+    不必每次从全量历史重算。累计的浮点误差每 resync_every 次更新后从 R 重算一次。
+    """
+    def __init__(self, window=120, resync_every=60):
+        self.window = window
+        self.resync_every = resync_every
+        self.codes = []
+        self.dates = []
+        self.R = np.zeros((0, 0))
+        self.S = np.zeros(0)
+        self.P = np.zeros((0, 0))
+        self.updates = 0
+
+    @classmethod
+    def load(cls, path, window=120, resync_every=60):
+        cov = cls(window, resync_every)
+        if not path or not os.path.exists(path): return cov
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                cov.codes = [str(c) for c in data['codes']]
+                cov.dates = [str(d) for d in data['dates']]
+                cov.R, cov.S, cov.P = data['R'], data['S'], data['P']
+                cov.updates = int(data['updates'])
+            # 窗口长度改小时直接截断
+            if len(cov.dates) > window:
+                cov.dates, cov.R = cov.dates[-window:], cov.R[-window:]
+                cov._resync()
+        except Exception as e:
+            logger.warning(f"📐 协方差状态加载失败，重新累计: {e}")
+            cov = cls(window, resync_every)
+        return cov
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path[:-len('.npz')] + '.tmp.npz' if path.endswith('.npz') else path + '.tmp.npz'
+        np.savez(tmp, codes=np.array(self.codes, dtype=str), dates=np.array(self.dates, dtype=str),
+                 R=self.R, S=self.S, P=self.P, updates=self.updates)
+        os.replace(tmp, path)
+
+    def _resync(self):
+        self.S = self.R.sum(axis=0)
+        self.P = self.R.T @ self.R
+
+    def _drop_codes(self, keep):
+        idx = [i for i, c in enumerate(self.codes) if c in keep]
+        self.codes = [self.codes[i] for i in idx]
+        self.R = self.R[:, idx]
+        self._resync()
+
+    def _add_code(self, code, returns):
+        """新基金: 用其历史收益回填当前窗口 (缺失日按 0)，只补一行一列 O(W·N)"""
+        col = np.array([returns.get(d, 0.0) for d in self.dates], dtype='float64')
+        self.R = np.column_stack([self.R, col])
+        cross = self.R.T @ col
+        n = len(self.codes)
+        P = np.zeros((n + 1, n + 1))
+        P[:n, :n] = self.P
+        P[n, :], P[:, n] = cross, cross
+        self.P = P
+        self.S = np.append(self.S, col.sum())
+        self.codes.append(code)
+
+    def _push(self, day, r):
+        self.R = np.vstack([self.R, r])
+        self.S = self.S + r
+        self.P = self.P + np.outer(r, r)
+        self.dates.append(day)
+        if len(self.dates) > self.window:
+            old = self.R[0]
+            self.R = self.R[1:]
+            self.dates.pop(0)
+            self.S = self.S - old
+            self.P = self.P - np.outer(old, old)
+        self.updates += 1
+        if self.updates % self.resync_every == 0: self._resync()
+
+    def update(self, histories, codes, through=None):
+        """
+        histories: {code: DataFrame}，codes: 当前关注的全部基金
+        只追加窗口最后一天之后、且截至 through (最近已收盘日) 的日期；
+        某只在关注列表里的基金本次没有行情时 (抓取失败 / 断点续跑)，暂缓追加，留到下次运行。
+        """
+        returns = {}
+        for code, df in histories.items():
+            if df is None or df.empty or code not in codes: continue
+            close = df['close'].astype('float64')
+            ret = close.pct_change().dropna()
+            keys = pd.DatetimeIndex(ret.index).strftime('%Y-%m-%d')
+            if through is not None:
+                mask = keys <= through.isoformat()
+                ret, keys = ret[mask], keys[mask]
+            returns[code] = dict(zip(keys, ret.to_numpy()))
+
+        if set(self.codes) - set(codes): self._drop_codes(set(codes))
+        if not self.dates:
+            self.codes = []
+            self.R, self.S, self.P = np.zeros((0, 0)), np.zeros(0), np.zeros((0, 0))
+        for code in codes:
+            if code not in self.codes and code in returns:
+                self._add_code(code, returns[code])
+
+        last = self.dates[-1] if self.dates else ''
+        new_days = sorted({d for r in returns.values() for d in r if d > last})
+        if not self.dates: new_days = new_days[-self.window:]
+        ends = {code: max(r) if r else '' for code, r in returns.items()}
+        added = 0
+        for day in new_days:
+            if any(code not in returns or ends[code] < day for code in self.codes):
+                break
+            # 停牌日 (该基金之后仍有行情) 收益记 0
+            self._push(day, np.array([returns[c].get(day, 0.0) for c in self.codes], dtype='float64'))
+            added += 1
+        return added
+
+    def covariance(self):
+        n = len(self.dates)
+        if n < 2: return None
+        return (self.P - np.outer(self.S, self.S) / n) / (n - 1)
+
+class PortfolioRisk:
+    """
+    [V15 组合风控]
+    单只基金的熔断只看自身；这里在组合层面把相关性考虑进来:
+    1. 组合波动率 / 边际风险贡献 / 历史 VaR (基于当前持仓 + 今日拟买入)
+    2. 相关性高于阈值的拟买入基金视为同一簇，一簇合计不超过 max_daily_invest × cluster_ratio
+    3. 全部拟买入合计不超过 max_daily_invest
+    """
+    def __init__(self, config):
+        g = config.get('global', {})
+        cfg = g.get('portfolio_risk', {})
+        self.max_daily_invest = g.get('max_daily_invest', 5000)
+        self.enabled = cfg.get('enabled', True)
+        self.corr_threshold = cfg.get('corr_threshold', 0.7)
+        self.cluster_ratio = cfg.get('cluster_ratio', 0.5)
+        self.var_confidence = cfg.get('var_confidence', 0.95)
+        self.min_trade = cfg.get('min_trade', 100)
+        self.path = cfg.get('path', 'cache/portfolio_cov.npz')
+        self.cov = RollingCovariance.load(self.path, cfg.get('window', 120), cfg.get('resync_every', 60))
+
+    def update(self, histories, codes, through=None):
+        added = self.cov.update(histories, codes, through)
+        self.cov.save(self.path)
+        logger.info(f"📐 [组合风控] 协方差窗口 {len(self.cov.dates)} 日 × {len(self.cov.codes)} 只，本次新增 {added} 日")
+        return added
+
+    def _vector(self, amounts):
+        x = np.zeros(len(self.cov.codes))
+        index = {c: i for i, c in enumerate(self.cov.codes)}
+        for code, v in amounts.items():
+            if code in index: x[index[code]] += v
+        return x
+
+    def _clusters(self, codes, cov):
+        """拟买入基金按相关性 >= 阈值做并查集聚类"""
+        index = {c: i for i, c in enumerate(self.cov.codes)}
+        known = [c for c in codes if c in index]
+        parent = {c: c for c in codes}
+        def find(c):
+            while parent[c] != c:
+                parent[c] = parent[parent[c]]
+                c = parent[c]
+            return c
+        if cov is not None and known:
+            ids = [index[c] for c in known]
+            sub = cov[np.ix_(ids, ids)]
+            sd = np.sqrt(np.clip(np.diag(sub), 1e-18, None))
+            corr = sub / np.outer(sd, sd)
+            for a in range(len(known)):
+                for b in range(a + 1, len(known)):
+                    if corr[a, b] >= self.corr_threshold:
+                        parent[find(known[a])] = find(known[b])
+        groups = {}
+        for c in codes: groups.setdefault(find(c), []).append(c)
+        return list(groups.values())
+
+    def cap_buys(self, buys):
+        """
+        buys: {code: 拟买入金额}
+        返回 (capped, notes): 压缩后的金额 与 {code: 说明}；低于 min_trade 的买入取消 (金额 0)
+        """
+        capped = dict(buys)
+        notes = {}
+        if not buys: return capped, notes
+        if self.enabled:
+            cluster_cap = self.max_daily_invest * self.cluster_ratio
+            for group in self._clusters(list(buys), self.cov.covariance()):
+                total = sum(capped[c] for c in group)
+                if len(group) > 1 and total > cluster_cap:
+                    scale = cluster_cap / total
+                    for c in group:
+                        capped[c] = int(capped[c] * scale)
+                        notes[c] = f"与 {len(group) - 1} 只高相关基金同日买入，同簇合计压缩至 {int(cluster_cap)} 元"
+        total = sum(capped.values())
+        if total > self.max_daily_invest:
+            scale = self.max_daily_invest / total
+            for c in capped:
+                capped[c] = int(capped[c] * scale)
+                notes[c] = _join(notes.get(c), f"单日买入合计超过 {self.max_daily_invest} 元，按比例压缩")
+        for c in capped:
+            if 0 < capped[c] < self.min_trade:
+                capped[c] = 0
+                notes[c] = _join(notes.get(c), f"压缩后不足 {self.min_trade} 元，取消买入")
+        return capped, notes
+
+    def assess(self, values):
+        """
+        values: {code: 持仓市值 (含今日买入)}
+        返回组合日波动、历史 VaR 与各基金风险贡献占比；协方差不足时返回 None
+        """
+        cov = self.cov.covariance()
+        x = self._vector(values)
+        total = x.sum()
+        if cov is None or total <= 0: return None
+        sigma = float(np.sqrt(max(x @ cov @ x, 0.0)))
+        mrc = cov @ x / sigma if sigma > 0 else np.zeros_like(x)
+        share = x * mrc / sigma if sigma > 0 else np.zeros_like(x)
+        pnl = self.cov.R @ x
+        var = float(-np.percentile(pnl, (1 - self.var_confidence) * 100))
+        contrib = {c: float(share[i]) for i, c in enumerate(self.cov.codes) if x[i] > 0}
+        return {"value": float(total), "vol": sigma, "vol_pct": sigma / total,
+                "var": var, "var_pct": var / total, "contrib": contrib,
+                "mrc": {c: float(mrc[i]) for i, c in enumerate(self.cov.codes) if x[i] > 0}}
+
+    def table(self, report, names=None):
+        names = names or {}
+        lines = [f"组合市值 {report['value']:,.0f} 元 | 日波动 {report['vol']:,.0f} 元 ({report['vol_pct']:.2%}) | "
+                 f"VaR{self.var_confidence:.0%} {report['var']:,.0f} 元 ({report['var_pct']:.2%})"]
+        for code, s in sorted(report['contrib'].items(), key=lambda kv: -kv[1]):
+            lines.append(f"  {names.get(code, code):<12} 风险贡献 {s:>7.1%}  边际 {report['mrc'][code]:.4f}")
+        return "\n".join(lines)
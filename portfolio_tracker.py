@@ -7,7 +7,8 @@ from utils import logger
 class PortfolioTracker:
     def __init__(self, filepath='portfolio.json'):
         self.filepath = filepath
-        self.lock = threading.Lock()
+        # 可重入: 调用方持锁期间 add_trade 还会再次加锁
+        self.lock = threading.RLock()
         self.data = self._load()
 
     def _load(self):
@@ -38,9 +39,17 @@ class PortfolioTracker:
             if len(history) > 30: history.pop(0)
         self._save()
 
-    def add_trade(self, code, name, amount, price, is_sell=False):
+    def add_trade(self, code, name, amount, price, is_sell=False, trade_id=None):
         # 简化版持仓更新
         with self.lock:
+            # 幂等: 同一 trade_id (如 "日期:代码") 只记一次，断点续跑重算时不会重复加仓
+            if trade_id is not None:
+                applied = self.data.setdefault('applied_trades', [])
+                if trade_id in applied:
+                    logger.info(f"💾 交易 {trade_id} 已记账，跳过")
+                    return False
+                applied.append(trade_id)
+                if len(applied) > 200: applied.pop(0)
             pos = self.data['positions'].get(code, {"shares": 0, "cost": 0, "held_days": 0})
             if not is_sell: # 买入
                 shares = amount / price
@@ -54,6 +63,7 @@ class PortfolioTracker:
             
             self.data['positions'][code] = pos
             self._save()
+            return True
     
     def get_signal_history(self, code):
         return self.data['signals'].get(code, [])
@@ -0,0 +1,154 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils import logger
+
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+class PriceStore:
+    """
+    [V15 共享行情面板]
+    由抓取阶段写入的内存映射面板文件 (日期 × 代码 × 字段)。
+    物理布局按代码连续存储 (codes, dates, fields)，单只基金的切片是一块连续内存，
+    工作进程以只读方式 np.memmap 挂载后可零拷贝构建 DataFrame，无需 pickle 传输。
+    """
+    def __init__(self, path='cache/price_panel'):
+        self.path = path
+        self.data_file = f"{path}.bin"
+        self.meta_file = f"{path}.json"
+        self.panel = None
+        self.meta = None
+        self.dates = None
+        self.code_index = {}
+
+    @staticmethod
+    def _normalize(df):
+        df = df[[f for f in PANEL_FIELDS if f in df.columns]].copy()
+        idx = pd.DatetimeIndex(pd.to_datetime(df.index))
+        if idx.tz is not None: idx = idx.tz_localize(None)
+        df.index = idx.normalize()
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        return df.reindex(columns=PANEL_FIELDS).apply(pd.to_numeric, errors='coerce')
+
+    def write(self, histories, complete_through=None):
+        """
+        抓取阶段调用: histories = {code: DataFrame}
+        complete_through: 写入时最近一根已收盘K线的日期，之后的K线视为盘中未完成
+        """
+        frames = {code: self._normalize(df) for code, df in histories.items() if df is not None and not df.empty}
+        if not frames:
+            logger.warning("📦 [行情面板] 无可写入数据")
+            return False
+
+        all_dates = pd.DatetimeIndex(sorted(set().union(*[f.index for f in frames.values()])))
+        codes = list(frames.keys())
+        shape = (len(codes), len(all_dates), len(PANEL_FIELDS))
+
+        os.makedirs(os.path.dirname(self.data_file) or '.', exist_ok=True)
+        tmp_data = self.data_file + '.tmp'
+        panel = np.memmap(tmp_data, dtype='float64', mode='w+', shape=shape)
+        panel[:] = np.nan
+        spans = {}
+        for i, code in enumerate(codes):
+            f = frames[code]
+            pos = all_dates.get_indexer(f.index)
+            panel[i, pos, :] = f.to_numpy(dtype='float64')
+            spans[code] = [int(pos.min()), int(pos.max()) + 1]
+        panel.flush()
+        del panel
+
+        meta = {
+            "shape": list(shape),
+            "fields": PANEL_FIELDS,
+            "codes": codes,
+            "spans": spans,
+            "complete_through": complete_through.isoformat() if complete_through else None,
+            "dates": [d.strftime("%Y-%m-%d") for d in all_dates]
+        }
+        tmp_meta = self.meta_file + '.tmp'
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        # 先换数据再换元信息，挂载方总能读到一致的一对文件
+        os.replace(tmp_data, self.data_file)
+        os.replace(tmp_meta, self.meta_file)
+        logger.info(f"📦 [行情面板] 写入 {len(codes)} 只基金 × {len(all_dates)} 个交易日")
+        return True
+
+    def attach(self):
+        """工作进程调用: 只读挂载"""
+        with open(self.meta_file, 'r') as f:
+            self.meta = json.load(f)
+        self.panel = np.memmap(self.data_file, dtype='float64', mode='r', shape=tuple(self.meta['shape']))
+        self.dates = pd.DatetimeIndex(self.meta['dates'])
+        self.code_index = {c: i for i, c in enumerate(self.meta['codes'])}
+        return self
+
+    @classmethod
+    def open_existing(cls, path):
+        """挂载上一次写入的面板，不存在时返回 None"""
+        store = cls(path)
+        if not (os.path.exists(store.data_file) and os.path.exists(store.meta_file)): return None
+        try:
+            return store.attach()
+        except Exception as e:
+            logger.warning(f"📦 [行情面板] 旧面板不可用: {e}")
+            return None
+
+    def complete_through(self, code):
+        """该基金在面板中最后一根已收盘K线的日期"""
+        start, end = self.meta['spans'][code]
+        last = self.dates[end - 1].date()
+        marker = self.meta.get('complete_through')
+        return min(last, date.fromisoformat(marker)) if marker else last
+
+    def codes(self):
+        return list(self.code_index.keys())
+
+    def get_history(self, code):
+        """返回基于 memmap 的只读 DataFrame 视图 (不复制底层数据)"""
+        if self.panel is None: self.attach()
+        i = self.code_index.get(code)
+        if i is None: return None
+        start, end = self.meta['spans'][code]
+        block = self.panel[i, start:end, :]
+        return pd.DataFrame(block, index=self.dates[start:end], columns=self.meta['fields'], copy=False)
+
+# --- 工作进程侧 ---
+_ATTACHED = {}
+
+def _attached_store(path):
+    store = _ATTACHED.get(path)
+    if store is None:
+        store = PriceStore(path).attach()
+        _ATTACHED[path] = store
+    return store
+
+def _analyze_worker(path, fund, config, volatility):
+    from technical_analyzer import TechnicalAnalyzer
+    from risk_control import RiskController
+    store = _attached_store(path)
+    df = store.get_history(fund['code'])
+    if df is None or df.empty: return fund['code'], None
+    tech = TechnicalAnalyzer.calculate_indicators(df)
+    risk = RiskController(config).analyze_risk(fund['name'], tech, volatility)
+    return fund['code'], (tech, risk)
+
+def analyze_in_pool(path, funds, config, volatility, max_workers=4):
+    """
+    在进程池中并行运行 TechnicalAnalyzer + RiskController。
+    每个进程只挂载一次面板文件，任务参数只有代码与配置。
+    返回: {code: (tech, risk)}
+    """
+    prepared = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_analyze_worker, path, f, config, volatility) for f in funds]
+        for future in as_completed(futures):
+            try:
+                code, res = future.result()
+                if res is not None: prepared[code] = res
+            except Exception as e:
+                logger.error(f"并行指标计算失败: {e}")
+    return prepared
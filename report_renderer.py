@@ -0,0 +1,270 @@
+import time
+from string import Template
+from utils import logger
+from news_dedup import dedup_headlines
+
+# --- [V15 UI 渲染引擎] 预编译模板 + 共享 CSS 类 ---
+# 所有样式集中在 <style> 中，卡片只引用类名；输出按片段收集后一次 join。
+
+REPORT_CSS = """
+body { background: #0a0a0a; color: #f0e6d2; font-family: 'Segoe UI', 'Microsoft YaHei', sans-serif; max-width: 660px; margin: 0 auto; padding: 20px; }
+.header { text-align: center; border-bottom: 2px solid #333; padding-bottom: 20px; margin-bottom: 25px; }
+.title { color: #ffb74d; margin: 0; font-size: 32px; font-weight: 800; font-family: 'Times New Roman', serif; letter-spacing: 2px; }
+.subtitle { font-size: 11px; color: #888; margin-top: 8px; text-transform: uppercase; letter-spacing: 1px; }
+.radar-panel { background: #111; border: 1px solid #333; border-radius: 4px; padding: 15px; margin-bottom: 25px; }
+.radar-title { font-size: 14px; color: #ffb74d; font-weight: bold; margin-bottom: 12px; border-bottom: 1px solid #444; padding-bottom: 6px; letter-spacing: 1px; }
+.news { font-size:11px; color:#ccc; margin-bottom:5px; border-bottom:1px dashed #333; padding-bottom:3px; }
+.news i { font-style:normal; color:#999; margin-right:4px; }
+.news.hot i { color:#ffb74d; }
+.news b { color:#ff8a80; font-size:9px; margin-right:4px; }
+.cio-section { background: linear-gradient(145deg, #1a0505, #2b0b0b); border: 1px solid #5c1818; border-left: 4px solid #d32f2f; padding: 20px; margin-bottom: 20px; border-radius: 2px; box-shadow: 0 4px 10px rgba(0,0,0,0.3); }
+.cio-section p, .cio-section div, .cio-section h3 { color: #ffffff !important; line-height: 1.6; }
+.cio-head { font-size:16px; font-weight:bold; margin-bottom:15px; color:#eee; text-transform:uppercase; }
+.advisor-section { background: #0f0f0f; border: 1px solid #d4af37; border-left: 4px solid #ffd700; padding: 20px; margin-bottom: 30px; border-radius: 4px; box-shadow: 0 0 10px rgba(212, 175, 55, 0.2); }
+.advisor-section * { color: #ffffff !important; line-height: 1.6; font-family: 'Georgia', serif; }
+.advisor-head { font-size:16px; font-weight:bold; margin-bottom:15px; color:#ffd700; }
+.card { border-left:4px solid #555; margin-bottom:15px; padding:15px; border-radius:6px; box-shadow:0 4px 10px rgba(0,0,0,0.6); border-top:1px solid #333; background:linear-gradient(90deg, rgba(30,30,30,0.9) 0%, rgba(15,15,15,0.95) 100%); }
+.card.lv3 { border-left-color:#b71c1c; background:linear-gradient(90deg, rgba(60,0,0,0.9) 0%, rgba(20,20,20,0.95) 100%); }
+.card.lv2 { border-left-color:#e65100; background:linear-gradient(90deg, rgba(60,30,0,0.9) 0%, rgba(20,20,20,0.95) 100%); }
+.card.lv1 { border-left-color:#fbc02d; background:linear-gradient(90deg, rgba(40,40,0,0.9) 0%, rgba(20,20,20,0.95) 100%); }
+.card.buy { border-left-color:#2e7d32; background:linear-gradient(90deg, rgba(10,40,10,0.9) 0%, rgba(20,20,20,0.95) 100%); }
+.card-head { display:flex; justify-content:space-between; align-items:center; margin-bottom:10px; }
+.fund-name { font-size:18px; font-weight:bold; color:#f0e6d2; font-family:'Times New Roman',serif; }
+.badge { margin-left:8px; color:white; padding:2px 6px; border-radius:3px; font-size:10px; background:#2e7d32; }
+.badge.lv3 { background:#b71c1c; font-weight:bold; }
+.badge.lv2 { background:#e65100; font-weight:bold; }
+.badge.lv1 { background:#fbc02d; color:black; font-weight:bold; }
+.score-box { text-align:right; }
+.score { color:#ffb74d; font-weight:bold; font-size:16px; text-shadow:0 0 5px rgba(255,183,77,0.3); }
+.action { font-size:10px; color:#aaa; }
+.act { font-size:14px; color:#777; }
+.act.buy { color:#ff8a80; font-weight:bold; }
+.act.sell { color:#a5d6a7; font-weight:bold; }
+.profit { font-size:12px; margin-bottom:8px; background:rgba(255,255,255,0.05); padding:4px 8px; border-radius:3px; display:flex; justify-content:space-between; }
+.muted { color:#aaa; }
+.up { color:#ff5252; font-weight:bold; }
+.down { color:#69f0ae; font-weight:bold; }
+.flat { color:#ccc; font-weight:bold; }
+.risk-bar { background:rgba(0,0,0,0.3); padding:6px 10px; border-radius:4px; margin-bottom:10px; display:flex; align-items:center; border-left:2px solid #555; }
+.card.lv3 .risk-bar { border-left-color:#b71c1c; }
+.card.lv2 .risk-bar { border-left-color:#e65100; }
+.card.lv1 .risk-bar { border-left-color:#fbc02d; }
+.card.buy .risk-bar { border-left-color:#2e7d32; }
+.risk-label { font-size:11px; color:#aaa; margin-right:8px; }
+.risk-msg { font-size:11px; color:#fff; font-weight:bold; }
+.hard { display:grid; grid-template-columns:repeat(4, 1fr); gap:5px; font-size:11px; color:#bdbdbd; font-family:'Courier New',monospace; margin-bottom:8px; }
+.dots { margin-top:5px; margin-bottom:5px; }
+.dot { display:inline-block; width:6px; height:6px; border-radius:50%; background:#555; margin-right:3px; box-shadow:0 0 2px rgba(0,0,0,0.5); }
+.dot.b { background:#d32f2f; }
+.dot.s { background:#388e3c; }
+.committee { margin-top:12px; border-top:1px solid #444; padding-top:10px; }
+.committee-title { font-size:10px; color:#888; margin-bottom:6px; text-align:center; }
+.debate { display:flex; gap:10px; margin-bottom:8px; }
+.bull, .bear { flex:1; padding:8px; border-radius:4px; }
+.bull { background:rgba(27,94,32,0.2); border-left:2px solid #66bb6a; }
+.bear { background:rgba(183,28,28,0.2); border-left:2px solid #ef5350; }
+.role { font-size:11px; font-weight:bold; margin-bottom:4px; }
+.bull .role { color:#66bb6a; }
+.bear .role { color:#ef5350; }
+.quote { font-size:11px; line-height:1.3; font-style:italic; }
+.bull .quote { color:#c8e6c9; }
+.bear .quote { color:#ffcdd2; }
+.cio { background:linear-gradient(90deg, rgba(255,183,77,0.1) 0%, rgba(255,183,77,0.05) 100%); padding:10px; border-radius:4px; border:1px solid rgba(255,183,77,0.3); }
+.cio-row { display:flex; justify-content:space-between; margin-bottom:4px; }
+.cio-role { color:#ffb74d; font-size:12px; font-weight:bold; }
+.cio-adj { font-size:11px; }
+.cio-say { color:#fff3e0; font-size:12px; line-height:1.4; }
+.ai-error { color:#f44336; font-size:12px; margin-top:10px; }
+.compact { width:100%; border-collapse:collapse; font-size:11px; color:#bdbdbd; margin-bottom:15px; }
+.compact th { color:#ffb74d; text-align:left; border-bottom:1px solid #444; padding:4px; }
+.compact td { border-bottom:1px dashed #333; padding:4px; }
+.footer { text-align: center; font-size: 10px; color: #444; margin-top: 40px; }
+"""
+
+PAGE_TPL = Template("""<!DOCTYPE html><html><head><meta charset="utf-8"><style>$css</style></head><body>
+<div class="header"><h1 class="title">XUANTIE V15</h1><div class="subtitle">IRON FIST RISK CONTROL | VOLATILITY: $volatility</div></div>
+<div class="radar-panel"><div class="radar-title">📡 V15 全球情报雷达 (双源融合)</div>$news</div>
+<div class="cio-section"><div class="cio-head">🛑 CIO 战略审计 (V15)</div>$cio</div>
+<div class="advisor-section"><div class="advisor-head">🗡️ 玄铁先生复盘</div>$advisor</div>
+$cards$compact<div class="footer">EST. 2026 | POWERED BY IRON FIST ALGORITHM</div>
+</body></html>""")
+
+NEWS_TPL = Template('<div class="news$hot"><i>●</i>$mark$text</div>')
+
+DOT_TPL = Template('<span class="dot$cls" title="$date"></span>')
+
+CARD_TPL = Template("""<div class="card$cls"><div class="card-head">
+<div><span class="fund-name">$name</span><span class="badge$badge_cls">$badge</span></div>
+<div class="score-box"><div class="score">$score 分</div><div class="action">$action | $act</div></div></div>
+$profit<div class="risk-bar"><span class="risk-label">🛑 铁腕风控:</span><span class="risk-msg">$risk_msg</span></div>
+<div class="hard"><span>RSI: $rsi</span><span>MACD: $macd</span><span>VR: $vr</span><span>Wkly: $wkly</span></div>
+<div class="dots">$dots</div>$committee</div>
+""")
+
+PROFIT_TPL = Template('<div class="profit"><span class="muted">持仓成本: $cost</span><span class="$cls">$val元 ($pct)</span></div>')
+
+COMMITTEE_TPL = Template("""<div class="committee"><div class="committee-title">--- V15 铁腕联邦投委会 ---</div>
+<div class="debate"><div class="bull"><div class="role">🦊 CGO (增长)</div><div class="quote">"$bull"</div></div>
+<div class="bear"><div class="role">🐻 CRO (风控)</div><div class="quote">"$bear"</div></div></div>
+<div class="cio"><div class="cio-row"><div class="cio-role">⚖️ CIO 终审 (华尔街视角)</div><div class="cio-adj $adj_cls">修正: $adj</div></div>
+<div class="cio-say">$cio</div></div></div>""")
+
+COMPACT_TPL = Template("""<table class="compact"><tr><th>观望 (风控正常)</th><th>分</th><th>RSI</th><th>MACD</th><th>VR</th><th>信号</th></tr>
+$rows</table>""")
+
+COMPACT_ROW_TPL = Template('<tr><td>$name</td><td>$score</td><td>$rsi</td><td>$macd</td><td>$vr</td><td>$dots</td></tr>\n')
+
+BADGES = {
+    3: ("lv3", "⛔ 熔断 Lv3 (强制空仓)"),
+    2: ("lv2", "⚠️ 熔断 Lv2 (禁止重仓)"),
+    1: ("lv1", "🛡️ 熔断 Lv1 (预警)"),
+    0: ("", "✅ 风控正常")
+}
+HOT_KEYS = ('财社', '突发', '重磅')
+
+def prepare_news(all_news, limit=18):
+    """SimHash 近似去重并把突发/财社新闻置顶，单遍扫描，取满 limit 条即停"""
+    hot, normal = [], []
+    for n in dedup_headlines(all_news):
+        (hot if any(k in n for k in HOT_KEYS) else normal).append(n)
+        if len(hot) >= limit: break
+    return (hot + normal)[:limit]
+
+def _size(html):
+    return len(html.encode('utf-8'))
+
+def render_dots(hist, n=15, archive=None, code=None):
+    """历史信号点阵: 默认取最近15次记录；传入 RunArchive 时从运行档案读取 (不受 tracker 30 条上限限制)"""
+    if archive is not None and code:
+        hist = archive.signal_history(code, n) or hist
+    parts = []
+    for x in hist[-n:]:
+        cls = " b" if x['s'] == 'B' else (" s" if x['s'] in ['S', 'C'] else "")
+        parts.append(DOT_TPL.substitute(cls=cls, date=x["date"]))
+    return "".join(parts)
+
+def is_neutral(r):
+    """风控正常且无操作的观望基金，超出体积预算时折叠为紧凑表格"""
+    return r.get('action') == "观望" and r.get('risk', {}).get('fuse_level', 0) == 0
+
+def render_card(r, archive=None):
+    tech = r.get('tech', {})
+    risk = r.get('risk', {})
+    ai = r.get('ai', {})
+    pos_info = r.get('position_info', {})
+
+    fuse_level = risk.get('fuse_level', 0)
+    badge_cls, badge = BADGES[min(fuse_level, 3)]
+    badge_cls = f" {badge_cls}" if badge_cls else ""
+    card_cls = badge_cls or (" buy" if r['action'] == "买入" else "")
+
+    # --- 持仓收益 ---
+    profit_html = ""
+    if pos_info.get('shares', 0) > 0 and pos_info.get('cost', 0) > 0:
+        cost = pos_info['cost']
+        curr = tech.get('price', 0)
+        profit_val = (curr - cost) * pos_info['shares']
+        profit_html = PROFIT_TPL.substitute(
+            cost=f"{cost:.3f}", cls="up" if profit_val > 0 else "down",
+            val=f"{profit_val:+.1f}", pct=f"{(curr - cost) / cost * 100:+.2f}%")
+
+    # --- 辩论与裁决 ---
+    bull_say = ai.get('bull_say', 'N/A')
+    if bull_say != 'N/A':
+        adj = ai.get('adjustment', 0)
+        committee_html = COMMITTEE_TPL.substitute(
+            bull=bull_say, bear=ai.get('bear_say', 'N/A'), cio=ai.get('comment', 'N/A'),
+            adj=f"{adj:+d}", adj_cls="up" if adj > 0 else ("down" if adj < 0 else "flat"))
+    else:
+        committee_html = '<div class="ai-error">⚠️ AI 未生成有效辩论 (API Error)</div>'
+
+    # --- 交易动作 ---
+    if r['action'] == "买入":
+        act_html = f'<span class="act buy">+{r["amount"]:,}</span>'
+    elif r['action'] == "卖出":
+        act_html = '<span class="act sell">SELL</span>'
+    else:
+        act_html = '<span class="act">HOLD</span>'
+
+    return CARD_TPL.substitute(
+        cls=card_cls, badge_cls=badge_cls, name=r['name'], badge=badge,
+        score=r.get('score', 0), action=r['action'], act=act_html, profit=profit_html,
+        risk_msg=risk.get('risk_msg', '正常'), rsi=tech.get('rsi', 0),
+        macd=tech.get('macd', {}).get('trend', 'N/A'),
+        vr=tech.get('risk_factors', {}).get('vol_ratio', 0), wkly=tech.get('trend_weekly', '-'),
+        dots=render_dots(r.get('history', []), archive=archive, code=r.get('code')), committee=committee_html)
+
+def render_compact_row(r, archive=None):
+    tech = r.get('tech', {})
+    return COMPACT_ROW_TPL.substitute(
+        name=r['name'], score=r.get('score', 0), rsi=tech.get('rsi', 0),
+        macd=tech.get('macd', {}).get('trend', 'N/A'),
+        vr=tech.get('risk_factors', {}).get('vol_ratio', 0), dots=render_dots(r.get('history', []), n=5, archive=archive, code=r.get('code')))
+
+def render_html_report_v15_full(all_news, results, cio_html, advisor_html, volatility, budget_bytes=None, news_limit=18, fresh=None, archive=None):
+    """
+    [V15] 完整决策报告。
+    budget_bytes: 报告体积预算。先渲染有动作/有熔断的卡片，观望基金在预算内渲染完整卡片，
+    超出部分折叠进紧凑表格。
+    fresh: 本次运行新增的标题集合，渲染时加 NEW 标记。
+    archive: RunArchive，信号点阵从运行档案读取。
+    """
+    fresh = fresh or set()
+    news_html = "".join(
+        NEWS_TPL.substitute(hot=" hot" if ('财社' in n or '突发' in n) else "", mark="<b>NEW</b>" if n in fresh else "", text=n)
+        for n in prepare_news(all_news, news_limit))
+
+    cards, neutral = [], []
+    used = _size(REPORT_CSS) + _size(news_html) + _size(cio_html) + _size(advisor_html)
+    for r in results:
+        if is_neutral(r):
+            neutral.append(r)
+            continue
+        try:
+            card = render_card(r, archive)
+            cards.append(card)
+            used += _size(card)
+        except Exception as e:
+            logger.error(f"渲染卡片失败 {r.get('name')}: {e}")
+
+    # 一旦开始折叠，其余观望基金全部进表格，保持顺序稳定
+    compact_rows = []
+    for r in neutral:
+        try:
+            if not compact_rows:
+                card = render_card(r, archive)
+                if budget_bytes is None or used + _size(card) <= budget_bytes:
+                    cards.append(card)
+                    used += _size(card)
+                    continue
+            compact_rows.append(render_compact_row(r, archive))
+        except Exception as e:
+            logger.error(f"渲染卡片失败 {r.get('name')}: {e}")
+
+    compact_html = COMPACT_TPL.substitute(rows="".join(compact_rows)) if compact_rows else ""
+    return PAGE_TPL.substitute(
+        css=REPORT_CSS, volatility=f"{volatility:.2%}", news=news_html, cio=cio_html,
+        advisor=advisor_html, cards="".join(cards), compact=compact_html)
+
+if __name__ == "__main__":
+    # 基准: 1000 只基金的渲染耗时与报告体积
+    import random
+    n_funds = 1000
+    news = [f"[10-19 14:{i % 60:02d}] ({'财社' if i % 3 else '东财'}) 标题 {i % 400}" for i in range(2000)]
+    results = []
+    for i in range(n_funds):
+        action = random.choices(["买入", "卖出", "观望"], weights=[10, 5, 85])[0]
+        results.append({
+            "name": f"基金{i:04d}", "code": f"{i:06d}", "score": random.randint(0, 100),
+            "action": action, "amount": 1000 if action == "买入" else 0,
+            "risk": {"fuse_level": random.choices([0, 1, 2, 3], weights=[90, 5, 3, 2])[0], "risk_msg": "风控正常"},
+            "ai": {"bull_say": "量价齐升" * 5, "bear_say": "估值偏高" * 5, "comment": "维持观望" * 10, "adjustment": random.randint(-30, 30)},
+            "tech": {"rsi": 55.2, "macd": {"trend": "金叉"}, "risk_factors": {"vol_ratio": 1.1}, "trend_weekly": "UP", "price": 1.2},
+            "history": [{"date": f"2026-10-{d:02d}", "s": random.choice("BSH")} for d in range(1, 16)],
+            "position_info": {"shares": 100, "cost": 1.1}
+        })
+    for budget in (None, 1_000_000, 300_000):
+        t0 = time.perf_counter()
+        html = render_html_report_v15_full(news, results, "<p>cio</p>", "<p>advisor</p>", 0.0123, budget_bytes=budget)
+        cost = time.perf_counter() - t0
+        print(f"funds={n_funds} budget={budget} render={cost * 1000:.1f}ms size={len(html.encode('utf-8')) / 1024:.0f}KB")
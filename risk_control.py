@@ -15,6 +15,13 @@ class RiskController:
         self.fuse_2 = self.config.get('fuse_level_2_drop', -0.04)
         self.fuse_3 = self.config.get('fuse_level_3_drop', -0.06)
 
+    def fuse_level(self, pct_change, vol_ratio=1.0):
+        """只根据跌幅与量比判定熔断等级 (0~3)，供报告与盘中告警共用"""
+        if pct_change <= self.fuse_3: return 3
+        if pct_change <= self.fuse_2: return 2
+        if pct_change < -0.015 and vol_ratio < 0.7: return 1
+        return 0
+
     def analyze_risk(self, fund_name, tech_indicators, volatility):
         """
         全流程风控检查
@@ -38,9 +45,10 @@ class RiskController:
         # (此处逻辑可扩展，目前主要影响熔断敏感度，暂时保持硬阈值)
         
         # 2. 三级熔断检查
+        level = self.fuse_level(pct_change, vol_ratio)
         
         # [三级熔断] 强制空仓
-        if pct_change <= self.fuse_3:
+        if level == 3:
             result["fuse_level"] = 3
             result["max_position_ratio"] = 0.0
             result["risk_msg"] = f"触发三级熔断(跌幅{pct_change:.2%})，强制空仓"
@@ -48,7 +56,7 @@ class RiskController:
             return result
 
         # [二级熔断] 限制买入 (只允许定投，禁止重仓)
-        if pct_change <= self.fuse_2:
+        if level == 2:
             result["fuse_level"] = 2
             result["max_position_ratio"] = 0.2
             result["risk_msg"] = f"触发二级熔断(跌幅{pct_change:.2%})，禁止重仓"
@@ -56,7 +64,7 @@ class RiskController:
             return result
 
         # [一级熔断] 缩量阴跌预警
-        if pct_change < -0.015 and vol_ratio < 0.7:
+        if level == 1:
             result["fuse_level"] = 1
             result["max_position_ratio"] = 0.5
             result["risk_msg"] = f"触发一级熔断(缩量阴跌 VR{vol_ratio})，谨慎行事"
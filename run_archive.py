@@ -0,0 +1,232 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from utils import logger, get_beijing_time
+
+# 列名 -> numpy 类型 (定长字符串便于 npz 直接存取)
+COLUMNS = OrderedDict([
+    ("date", "U10"), ("code", "U12"), ("name", "U32"), ("action", "U4"), ("signal", "U1"),
+    ("score", "f8"), ("quant_score", "f8"), ("ai_adj", "f8"), ("fuse_level", "i1"), ("amount", "f8"),
+    ("price", "f8"), ("pct_change", "f8"), ("rsi", "f8"), ("macd_hist", "f8"),
+    ("vol_ratio", "f8"), ("pct_b", "f8"), ("obv_slope", "f8"), ("trend_weekly", "U8"),
+])
+
+def _signal(action):
+    return "B" if "买" in action else ("S" if "卖" in action else "H")
+
+def _num(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _row(r, run_date):
+    tech = r.get('tech', {})
+    risk_factors = tech.get('risk_factors', {})
+    return {
+        "date": run_date, "code": r['code'], "name": r.get('name', ''),
+        "action": r.get('action', ''), "signal": _signal(r.get('action', '')),
+        "score": _num(r.get('score')), "quant_score": _num(tech.get('quant_score')),
+        "ai_adj": _num(r.get('ai', {}).get('adjustment')),
+        "fuse_level": int(r.get('risk', {}).get('fuse_level', 0)), "amount": _num(r.get('amount', 0)),
+        "price": _num(tech.get('price')), "pct_change": _num(tech.get('pct_change')),
+        "rsi": _num(tech.get('rsi')), "macd_hist": _num(tech.get('macd', {}).get('hist')),
+        "vol_ratio": _num(risk_factors.get('vol_ratio')), "pct_b": _num(risk_factors.get('bollinger_pct_b')),
+        "obv_slope": _num(tech.get('flow', {}).get('obv_slope')), "trend_weekly": tech.get('trend_weekly', ''),
+    }
+
+class _Part:
+    """打开的分片: 列在首次访问时从 npz 读出并缓存"""
+    def __init__(self, path):
+        self.npz = np.load(path, allow_pickle=False)
+        self.columns = {}
+
+    def __getitem__(self, name):
+        col = self.columns.get(name)
+        if col is None:
+            col = self.columns[name] = self.npz[name]
+        return col
+
+    def close(self):
+        self.npz.close()
+
+class RunArchive:
+    """
+    [V15 运行档案]
+    每次运行的逐基金结果 (评分、AI 修正、熔断等级、指标、操作) 追加写入列式档案:
+      archive/runs/YYYY-MM/part-000001.npz  一次写入即不可变，行按 (代码, 日期) 排序
+      archive/runs/YYYY-MM/index.json       各分片的日期范围与 代码 -> [起, 止) 行区间
+    查询时按月份和日期范围跳过无关分区、按代码索引只切出需要的行，分片加载后进程内 LRU 缓存。
+    同一 (代码, 日期) 多次写入 (断点续跑 / 重跑) 以最新分片为准；已结束月份的多个分片自动合并。
+    """
+    def __init__(self, root='archive/runs', cache_parts=64):
+        self.root = root
+        self.cache_parts = cache_parts
+        self.lock = threading.Lock()
+        self._parts = OrderedDict()   # (month, file) -> {column: array}
+        self._indexes = {}            # month -> (mtime, index)
+
+    # --- 存储 ---
+    def _month_dir(self, month):
+        return os.path.join(self.root, month)
+
+    def _index(self, month):
+        path = os.path.join(self._month_dir(month), 'index.json')
+        if not os.path.exists(path): return {"seq": 1, "parts": []}
+        mtime = os.path.getmtime(path)
+        cached = self._indexes.get(month)
+        if cached and cached[0] == mtime: return cached[1]
+        with open(path, 'r') as f:
+            index = json.load(f)
+        self._indexes[month] = (mtime, index)
+        return index
+
+    def _write_index(self, month, index):
+        path = os.path.join(self._month_dir(month), 'index.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(path + '.tmp', path)
+        self._indexes.pop(month, None)
+
+    def _write_part(self, month, index, columns):
+        """按 (代码, 日期) 排序后写成一个新分片，返回其索引条目"""
+        order = np.lexsort((columns['date'], columns['code']))
+        columns = {k: v[order] for k, v in columns.items()}
+        seq = index['seq']
+        name = f"part-{seq:06d}.npz"
+        path = os.path.join(self._month_dir(month), name)
+        np.savez(path[:-4] + '.tmp.npz', **columns)
+        os.replace(path[:-4] + '.tmp.npz', path)
+        dates = np.sort(columns['date'])
+        codes, starts = np.unique(columns['code'], return_index=True)
+        ends = list(starts[1:]) + [len(order)]
+        index['seq'] = seq + 1
+        return {"file": name, "seq": seq, "rows": int(len(order)),
+                "date_min": str(dates[0]), "date_max": str(dates[-1]),
+                "codes": {str(c): [int(s), int(e)] for c, s, e in zip(codes, starts, ends)}}
+
+    def append(self, results, run_date=None):
+        """追加一次运行的结果 (list of result dict)，返回写入行数"""
+        run_date = run_date or get_beijing_time().strftime('%Y-%m-%d')
+        rows = [_row(r, run_date) for r in results if r]
+        if not rows: return 0
+        month = run_date[:7]
+        columns = {k: np.array([row[k] for row in rows], dtype=t) for k, t in COLUMNS.items()}
+        with self.lock:
+            os.makedirs(self._month_dir(month), exist_ok=True)
+            index = self._index(month)
+            index['parts'].append(self._write_part(month, index, columns))
+            self._write_index(month, index)
+            self._compact_closed_months(month)
+        logger.info(f"🗄️ [运行档案] {run_date} 写入 {len(rows)} 只基金")
+        return len(rows)
+
+    def _compact_closed_months(self, current):
+        """已结束月份不再追加: 多个分片合并为一个，并去掉重复写入的 (代码, 日期)"""
+        for month in self.months():
+            if month >= current: continue
+            index = self._index(month)
+            if len(index['parts']) <= 1: continue
+            merged = self._read_month(month, index, code=None)
+            old = [p['file'] for p in index['parts']]
+            new_index = {"seq": index['seq'], "parts": []}
+            new_index['parts'].append(self._write_part(month, new_index, merged))
+            self._write_index(month, new_index)
+            for name in old:
+                part = self._parts.pop((month, name), None)
+                if part is not None: part.close()
+                os.remove(os.path.join(self._month_dir(month), name))
+            logger.info(f"🗄️ [运行档案] {month} 合并 {len(old)} 个分片")
+
+    # --- 读取 ---
+    def months(self):
+        if not os.path.isdir(self.root): return []
+        return sorted(d for d in os.listdir(self.root) if len(d) == 7 and os.path.isdir(self._month_dir(d)))
+
+    def _load_part(self, month, name):
+        """分片保持打开，列按需读取 (只查信号时不必解压全部指标列)"""
+        key = (month, name)
+        part = self._parts.get(key)
+        if part is None:
+            part = _Part(os.path.join(self._month_dir(month), name))
+            self._parts[key] = part
+            while len(self._parts) > self.cache_parts: self._parts.popitem(last=False)[1].close()
+        else:
+            self._parts.move_to_end(key)
+        return part
+
+    def _read_month(self, month, index, code=None, start=None, end=None, fields=None):
+        """读取一个月份分区内匹配的行；同一 (代码, 日期) 只保留序号最大的分片中的那行"""
+        fields = ['date', 'code'] + [f for f in (fields or COLUMNS) if f not in ('date', 'code')]
+        chunks = []
+        for part in index['parts']:
+            if start and part['date_max'] < start: continue
+            if end and part['date_min'] > end: continue
+            if code is not None and code not in part['codes']: continue
+            data = self._load_part(month, part['file'])
+            sl = slice(*part['codes'][code]) if code is not None else slice(None)
+            chunk = {k: data[k][sl] for k in fields}
+            chunk['seq'] = np.full(len(chunk['date']), part['seq'])
+            chunks.append(chunk)
+        if not chunks: return {k: np.array([], dtype=COLUMNS[k]) for k in fields}
+        cols = {k: np.concatenate([c[k] for c in chunks]) for k in fields + ['seq']}
+        if len(chunks) > 1:
+            # 序号降序后按 (代码, 日期) 取首次出现 = 最新写入
+            order = np.argsort(-cols['seq'], kind='stable')
+            keys = np.char.add(cols['code'][order], cols['date'][order])
+            _, first = np.unique(keys, return_index=True)
+            cols = {k: v[order][first] for k, v in cols.items()}
+        cols.pop('seq')
+        return cols
+
+    def query(self, code=None, start=None, end=None, min_fuse_level=None, columns=None):
+        """
+        按代码 / 日期区间 ('YYYY-MM-DD') / 最低熔断等级 查询，返回按日期排序的 DataFrame
+        例: query("512480", start="2025-10-01")；query(start="2026-07-01", min_fuse_level=2)
+        """
+        names = [c for c in (columns or COLUMNS) if c in COLUMNS]
+        fields = names + (['fuse_level'] if min_fuse_level is not None else [])
+        chunks = []
+        for month in self.months():
+            if start and month < start[:7]: continue
+            if end and month > end[:7]: continue
+            cols = self._read_month(month, self._index(month), code, start, end, fields)
+            mask = np.ones(len(cols['date']), dtype=bool)
+            if start: mask &= cols['date'] >= start
+            if end: mask &= cols['date'] <= end
+            if min_fuse_level is not None: mask &= cols['fuse_level'] >= min_fuse_level
+            if mask.any(): chunks.append({k: v[mask] for k, v in cols.items()})
+        if not chunks: return pd.DataFrame(columns=names)
+        df = pd.DataFrame({k: np.concatenate([c[k] for c in chunks]) for k in names})
+        keys = [k for k in ('date', 'code') if k in df]
+        return df.sort_values(keys, kind='stable').reset_index(drop=True) if keys else df
+
+    def signal_history(self, code, n=15):
+        """最近 n 次 B/S/H 信号，格式与 PortfolioTracker 的 signals 相同，供 render_dots 使用"""
+        out = []
+        for month in reversed(self.months()):
+            cols = self._read_month(month, self._index(month), code, fields=['signal'])
+            order = np.argsort(cols['date'])
+            out = [{"date": str(d), "s": str(s)} for d, s in zip(cols['date'][order], cols['signal'][order])] + out
+            if len(out) >= n: break
+        return out[-n:]
+
+if __name__ == "__main__":
+    # python run_archive.py [code] [--since YYYY-MM-DD] [--fuse N]
+    import argparse
+    parser = argparse.ArgumentParser(description="玄铁运行档案查询")
+    parser.add_argument("code", nargs="?")
+    parser.add_argument("--since")
+    parser.add_argument("--fuse", type=int)
+    parser.add_argument("--root", default="archive/runs")
+    args = parser.parse_args()
+    import time
+    t = time.perf_counter()
+    df = RunArchive(args.root).query(args.code, start=args.since, min_fuse_level=args.fuse)
+    elapsed = (time.perf_counter() - t) * 1000
+    with pd.option_context('display.max_rows', 200, 'display.width', 200):
+        print(df[['date', 'code', 'name', 'action', 'score', 'ai_adj', 'fuse_level', 'amount', 'rsi']])
+    print(f"{len(df)} 行, {elapsed:.1f} ms")
@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import numpy as np
+from utils import logger, get_beijing_time
+
+def _to_json(obj):
+    """numpy 标量 / 集合等转为可序列化类型"""
+    if isinstance(obj, np.generic): return obj.item()
+    if isinstance(obj, (set, tuple)): return list(obj)
+    return str(obj)
+
+class RunCheckpoint:
+    """
+    [V15 断点续跑]
+    每个阶段 (波动率、宏观情报、单基金结果、汇总 HTML、报告投递) 的输出按交易日落盘到 checkpoints/YYYY-MM-DD/。
+    同日重跑时已完成的阶段直接读回，只从第一个未完成的阶段继续；
+    写入采用 "临时文件 + os.replace"，中途崩溃不会留下半个检查点。
+    """
+    def __init__(self, root='checkpoints', run_date=None, keep_days=7, enabled=True):
+        self.run_date = run_date or get_beijing_time().strftime('%Y-%m-%d')
+        self.root = root
+        self.dir = os.path.join(root, self.run_date)
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(os.path.join(self.dir, 'funds'), exist_ok=True)
+            self._prune(keep_days)
+
+    def _prune(self, keep_days):
+        runs = sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+        for old in runs[:-keep_days] if keep_days else []:
+            shutil.rmtree(os.path.join(self.root, old), ignore_errors=True)
+
+    def _path(self, stage):
+        return os.path.join(self.dir, f"{stage}.json")
+
+    def has(self, stage):
+        return self.enabled and os.path.exists(self._path(stage))
+
+    def load(self, stage):
+        if not self.has(stage): return None
+        try:
+            with open(self._path(stage), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"💾 检查点 {stage} 损坏，重新计算: {e}")
+            return None
+
+    def save(self, stage, value):
+        if not self.enabled: return
+        path = self._path(stage)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False, default=_to_json)
+        os.replace(tmp, path)
+
+    def stage(self, name, compute):
+        """已有检查点则读回，否则执行 compute() 并落盘"""
+        value = self.load(name)
+        if value is not None:
+            logger.info(f"💾 [断点续跑] 复用阶段 {name}")
+            return value
+        value = compute()
+        self.save(name, value)
+        return value
+
+    def fund_stage(self, code):
+        return f"funds/{code}"
+
+    def clear(self):
+        """丢弃当日全部检查点 (--no-resume)"""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        if self.enabled: os.makedirs(os.path.join(self.dir, 'funds'), exist_ok=True)
@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import time
+import threading
+
+class SourceScoreboard:
+    """
+    [V15 数据源健康榜]
+    按 "类别.数据源" (如 history.eastmoney / news.cls) 记录:
+    - EWMA 延迟、EWMA 成功率、调用次数、最近一次失败时间
+    每次调用后更新，运行结束落盘；下次运行据此决定数据源尝试顺序。
+    失败的代价按固定罚时 (约等于一次超时 + 换源) 计，而不是失败本身的耗时:
+    挂掉但秒回错误的源不会因为 "快" 排到前面。
+    """
+    def __init__(self, filepath='source_health.json', alpha=0.3, failure_cooldown=3600, failure_penalty=10.0):
+        self.filepath = filepath
+        self.alpha = alpha
+        self.failure_cooldown = failure_cooldown
+        self.failure_penalty = failure_penalty
+        self.lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.filepath):
+            return {}
+        try:
+            with open(self.filepath, 'r') as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def save(self):
+        with self.lock:
+            snapshot = json.dumps(self.data, indent=2)
+        with open(self.filepath, 'w') as f:
+            f.write(snapshot)
+
+    def record(self, key, ok, latency):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                entry = {"latency": latency, "success": 1.0 if ok else 0.0, "calls": 0, "last_failure": None}
+            else:
+                a = self.alpha
+                entry["latency"] = a * latency + (1 - a) * entry["latency"]
+                entry["success"] = a * (1.0 if ok else 0.0) + (1 - a) * entry["success"]
+            entry["calls"] += 1
+            if not ok: entry["last_failure"] = time.time()
+            self.data[key] = entry
+
+    def score(self, key):
+        """期望代价 (秒): 延迟 + 失败率 × 失败罚时，冷却期内失败过的源再加一次罚时；越小越优先"""
+        entry = self.data.get(key)
+        if entry is None: return None
+        cost = entry["latency"] + (1 - entry["success"]) * self.failure_penalty
+        last_failure = entry.get("last_failure")
+        if last_failure and time.time() - last_failure < self.failure_cooldown:
+            cost += self.failure_penalty
+        return cost
+
+    def order(self, group, names):
+        """按健康度给同类数据源排序；没有记录的源保持默认顺序排在后面"""
+        default = {name: i for i, name in enumerate(names)}
+        def key(name):
+            s = self.score(f"{group}.{name}")
+            return (s is None, s if s is not None else 0, default[name])
+        return sorted(names, key=key)
+
+    def table(self):
+        with self.lock:
+            items = sorted(self.data.items())
+        lines = [f"{'source':<22}{'ewma_ms':>9}{'success':>9}{'calls':>7}  last_failure"]
+        for key, e in items:
+            lf = time.strftime('%m-%d %H:%M', time.localtime(e['last_failure'])) if e.get('last_failure') else '-'
+            lines.append(f"{key:<22}{e['latency'] * 1000:>9.0f}{e['success']:>9.0%}{e['calls']:>7}  {lf}")
+        return "\n".join(lines)
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else 'source_health.json'
+    print(SourceScoreboard(path).table())
@@ -0,0 +1,98 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils import logger
+
+class StageGraph:
+    """
+    [V15 阶段调度图]
+    声明阶段及其输入 (依赖)，无依赖关系的阶段并发执行。
+    阶段函数以关键字参数接收上游结果: add("funds", fn, deps=("analyze", "macro")) -> fn(analyze=..., macro=...)
+    运行结束后给出每个阶段的起止时间与关键路径 (决定总耗时的那条依赖链)。
+    """
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.nodes = OrderedDict()
+        self.timings = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, fn, deps=()):
+        if name in self.nodes: raise ValueError(f"阶段重复: {name}")
+        self.nodes[name] = (fn, tuple(deps))
+        return self
+
+    def _check(self):
+        for name, (_, deps) in self.nodes.items():
+            for d in deps:
+                if d not in self.nodes: raise ValueError(f"阶段 {name} 依赖未声明的 {d}")
+        # Kahn 拓扑排序检测环
+        indeg = {n: len(deps) for n, (_, deps) in self.nodes.items()}
+        ready = [n for n, k in indeg.items() if k == 0]
+        seen = 0
+        while ready:
+            n = ready.pop()
+            seen += 1
+            for m, (_, deps) in self.nodes.items():
+                if n in deps:
+                    indeg[m] -= 1
+                    if indeg[m] == 0: ready.append(m)
+        if seen != len(self.nodes): raise ValueError("阶段依赖存在环")
+
+    def _run_node(self, name, fn, kwargs):
+        start = time.monotonic()
+        try:
+            return fn(**kwargs)
+        finally:
+            with self.lock:
+                self.timings[name] = (start - self.t0, time.monotonic() - self.t0)
+
+    def run(self):
+        """执行全部阶段，返回 {阶段名: 结果}；任一阶段抛错时不再启动其下游，等在途阶段结束后重新抛出"""
+        self._check()
+        self.t0 = time.monotonic()
+        results, error = {}, None
+        pending = OrderedDict(self.nodes)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    for name, (fn, deps) in list(pending.items()):
+                        if all(d in results for d in deps):
+                            kwargs = {d: results[d] for d in deps}
+                            running[executor.submit(self._run_node, name, fn, kwargs)] = name
+                            del pending[name]
+                if not running: break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"🧩 阶段 {name} 失败: {e}")
+                        error = error or e
+        self.wall = time.monotonic() - self.t0
+        if error is not None: raise error
+        return results
+
+    def critical_path(self):
+        """从最晚结束的阶段出发，沿 "最晚结束的上游" 回溯"""
+        if not self.timings: return []
+        node = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [node]
+        while True:
+            deps = [d for d in self.nodes[node][1] if d in self.timings]
+            if not deps: break
+            node = max(deps, key=lambda d: self.timings[d][1])
+            path.append(node)
+        return path[::-1]
+
+    def timing_table(self):
+        critical = set(self.critical_path())
+        lines = [f"{'stage':<12}{'start_s':>9}{'end_s':>9}{'dur_s':>9}  critical"]
+        for name, (start, end) in sorted(self.timings.items(), key=lambda kv: kv[1][0]):
+            lines.append(f"{name:<12}{start:>9.1f}{end:>9.1f}{end - start:>9.1f}  {'*' if name in critical else ''}")
+        path = self.critical_path()
+        busy = sum(self.timings[n][1] - self.timings[n][0] for n in path)
+        lines.append(f"关键路径: {' → '.join(path)} (阶段耗时 {busy:.1f}s / 总耗时 {getattr(self, 'wall', 0):.1f}s)")
+        return "\n".join(lines)
@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, time as dt_time
 from utils import logger, get_beijing_time
+from trading_calendar import get_calendar
 from ta.momentum import RSIIndicator
 from ta.trend import MACD
 from ta.volatility import BollingerBands
@@ -27,14 +28,13 @@ class TechnicalAnalyzer:
         else: return 240 
 
     @staticmethod
-    def calculate_indicators(df):
-        if df is None or df.empty or len(df) < 30: return {}
-
-        # --- [V14.29] 动态量能投影 ---
+    def _project_volume(df):
+        """[V14.29] 动态量能投影: 盘中将当日成交量折算为全天"""
         try:
             last_date = df.index[-1]
             now_bj = get_beijing_time()
-            if last_date.date() == now_bj.date() and now_bj.time() < dt_time(15, 0):
+            if (last_date.date() == now_bj.date() and now_bj.time() < dt_time(15, 0)
+                    and get_calendar().is_trading_day(now_bj)):
                 trade_mins = TechnicalAnalyzer._calculate_trade_minutes(now_bj.time())
                 if trade_mins > 15:
                     original_vol = df.iloc[-1]['volume']
@@ -48,9 +48,15 @@ class TechnicalAnalyzer:
         except Exception as e:
             logger.warning(f"量能投影微瑕: {e}")
 
+    @staticmethod
+    def calculate_indicators(df):
+        if df is None or df.empty or len(df) < 30: return {}
+
         indicators = {}
         try:
+            # 先复制再投影，不改动调用方的原始数据 (也兼容只读的 memmap 视图)
             df = df.ffill().bfill()
+            TechnicalAnalyzer._project_volume(df)
             close = df['close']
             volume = df['volume']
             current_price = close.iloc[-1]
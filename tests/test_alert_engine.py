@@ -0,0 +1,85 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from alert_engine import AlertNotifier, FuseAlertEngine
+from risk_control import RiskController
+
+CONFIG = {"global": {"alerts": {"debounce_ticks": 2, "hysteresis": 0.005, "email": False}}}
+
+class RecordingNotifier:
+    def __init__(self):
+        self.events = []
+
+    def notify(self, event):
+        self.events.append(event)
+
+@pytest.fixture
+def engine():
+    engine = FuseAlertEngine(CONFIG, RiskController(CONFIG), RecordingNotifier())
+    yield engine
+    engine.close()
+
+def feed(engine, *pcts):
+    return [engine.observe(time.time(), "512480", "半导体ETF", p) for p in pcts]
+
+def test_escalation_needs_debounce_ticks(engine):
+    # 单个 tick 的尖刺不确认
+    assert feed(engine, -0.045, -0.01) == [None, None]
+    events = feed(engine, -0.045, -0.045)
+    assert events[0] is None
+    assert events[1]["old_level"] == 0 and events[1]["new_level"] == 2
+    assert engine.levels["512480"] == 2
+
+def test_no_downgrade_within_hysteresis(engine):
+    feed(engine, -0.045, -0.045)
+    # -3.8% 已高于二级阈值 -4%，但回升不足 0.5%，维持二级
+    assert feed(engine, -0.038, -0.038, -0.038, -0.036) == [None] * 4
+    assert engine.levels["512480"] == 2
+
+def test_downgrade_after_recovering_past_hysteresis(engine):
+    feed(engine, -0.045, -0.045)
+    first, second = feed(engine, -0.03, -0.03)
+    assert first is None
+    assert second["old_level"] == 2 and second["new_level"] == 0
+    engine.close()
+    assert [e["new_level"] for e in engine.notifier.events] == [2, 0]
+
+class WebhookStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _WebhookHandler)
+        self.received = []
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append(json.loads(body))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def test_webhook_delivery_and_latency_report():
+    server = WebhookStub()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        config = {"global": {"alerts": dict(CONFIG["global"]["alerts"],
+                                             webhook_url=f"http://127.0.0.1:{server.server_address[1]}/hook")}}
+        engine = FuseAlertEngine(config, RiskController(config), AlertNotifier(config))
+        feed(engine, -0.07, -0.07)
+        engine.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(server.received) == 1
+    payload = server.received[0]
+    assert payload["event"]["new_level"] == 3
+    assert "三级熔断" in payload["text"]
+    report = engine.latency_report()
+    assert report["count"] == 1
+    assert 0 <= report["p50_ms"] <= report["max_ms"] < 5000
@@ -0,0 +1,44 @@
+import time
+import pytest
+
+pytest.importorskip("akshare")
+
+from data_fetcher import DataFetcher
+from utils import fund_deadline
+
+def hedged_fetcher(monkeypatch):
+    fetcher = DataFetcher({"global": {"data_source": {"hedge": True, "hedge_after": 0.1}}})
+    monkeypatch.setattr(fetcher, "_normalize_history", lambda df: df)
+    return fetcher
+
+def test_hedge_gives_up_when_all_sources_are_slow(monkeypatch):
+    fetcher = hedged_fetcher(monkeypatch)
+    slow = lambda code: time.sleep(2)
+    with fund_deadline(0.5):
+        start = time.monotonic()
+        assert fetcher._fetch_hedged("510300", [("eastmoney", slow), ("sina", slow)]) == (None, None)
+    assert time.monotonic() - start < 1.5
+
+def test_hedge_returns_first_valid_source(monkeypatch):
+    fetcher = hedged_fetcher(monkeypatch)
+    def slow(code):
+        time.sleep(1)
+        return "slow"
+    with fund_deadline(3):
+        assert fetcher._fetch_hedged("510300", [("eastmoney", slow), ("sina", lambda code: "fast")]) == ("fast", "sina")
+
+def test_drift_check_fetches_full_history_when_source_was_trimmed(monkeypatch):
+    import numpy as np
+    import pandas as pd
+    import lookback_planner
+    fetcher = DataFetcher({})
+    bars = fetcher.planner.bars
+    index = pd.bdate_range("2020-01-02", periods=6 * bars)
+    full = pd.DataFrame({"close": np.linspace(1.0, 2.0, len(index)), "volume": 1e6}, index=index)
+    requested, checked = [], []
+    monkeypatch.setattr(fetcher, "_fetch_eastmoney", lambda code, start=None: requested.append(start) or full)
+    monkeypatch.setattr(fetcher.planner, "check_drift", lambda code, df: checked.append(len(df)))
+    # 东财按规划起始日期返回的短K线: 需另取全量
+    fetcher._check_lookback_drift("510300", full.iloc[-bars:])
+    assert requested == [lookback_planner.FULL_HISTORY_START]
+    assert checked == [len(full)]
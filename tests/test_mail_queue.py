@@ -0,0 +1,88 @@
+import os
+import base64
+import threading
+import socketserver
+from email import message_from_string
+from email.header import decode_header, make_header
+import pytest
+from mail_queue import MailQueue
+
+class StubSMTP(socketserver.ThreadingTCPServer):
+    """本地明文 SMTP 替身: 前 fail_times 封在数据结束时回 451，之后正常收信"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, fail_times=0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.fail_times = fail_times
+        self.rejected = 0
+        self.delivered = []
+        self.logins = []
+        self.lock = threading.Lock()
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        self.reply("220 stub ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line: return
+            cmd = line.decode().strip()
+            verb = cmd.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-stub\r\n250-AUTH PLAIN\r\n250 OK\r\n")
+            elif verb == "AUTH":
+                _, user, password = base64.b64decode(cmd.split()[-1]).split(b"\0")
+                with server.lock: server.logins.append((user.decode(), password.decode()))
+                self.reply("235 Authentication successful")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b""): break
+                    data.append(chunk.decode())
+                with server.lock:
+                    if server.rejected < server.fail_times:
+                        server.rejected += 1
+                        self.reply("451 Requested action aborted: local error in processing")
+                        continue
+                    server.delivered.append("".join(data))
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+@pytest.fixture
+def smtp_stub():
+    server = StubSMTP(fail_times=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def subject_of(raw):
+    return str(make_header(decode_header(message_from_string(raw)['Subject'])))
+
+def test_transient_451_is_retried_until_spool_is_empty(tmp_path, smtp_stub):
+    spool = str(tmp_path / "mail")
+    mailer = MailQueue(spool_dir=spool, host="127.0.0.1", port=smtp_stub.server_address[1], use_ssl=False,
+                       user="bot@example.com", password="secret", base_delay=0.01, max_delay=0.05)
+    # 启动前落盘的 = 上次遗留，启动后入队的走后台线程
+    mailer.enqueue("玄铁 V15 决策报告 (遗留)", "<p>old</p>")
+    mailer.start()
+    mailer.enqueue("玄铁 V15 决策报告", "<p>today</p>")
+    mailer.enqueue("熔断告警", "<p>alert</p>")
+    assert mailer.close(timeout=10)
+
+    assert smtp_stub.rejected == 2
+    assert sorted(subject_of(m) for m in smtp_stub.delivered) == sorted(
+        ["玄铁 V15 决策报告 (遗留)", "玄铁 V15 决策报告", "熔断告警"])
+    assert smtp_stub.logins and smtp_stub.logins[0] == ("bot@example.com", "secret")
+    assert os.listdir(spool) == []
@@ -0,0 +1,17 @@
+from news_dedup import HeadlineDeduper, dedup_headlines
+
+HEADLINE = "[10:00] (财社) 央行宣布下调存款准备金率0.5个百分点"
+
+def test_same_day_rerun_keeps_headlines_fresh(tmp_path):
+    path = str(tmp_path / "news_seen.json")
+    first = HeadlineDeduper(path, run_id="2026-10-19")
+    assert first.dedup([HEADLINE])[1] == {HEADLINE}
+    first.save()
+    # 同日断点续跑: 首次尝试见过的标题仍是本次新增
+    assert HeadlineDeduper(path, run_id="2026-10-19").dedup([HEADLINE])[1] == {HEADLINE}
+    # 下一个交易日: 变成旧闻
+    assert HeadlineDeduper(path, run_id="2026-10-20").dedup([HEADLINE])[1] == set()
+
+def test_opposite_direction_headlines_are_not_merged():
+    news = ["沪指收涨1.2% 成交额破万亿", "沪指收跌1.2% 成交额破万亿", "[10:00] 沪指收涨1.2%，成交额破万亿"]
+    assert dedup_headlines(news) == news[:2]
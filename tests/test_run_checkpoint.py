@@ -0,0 +1,51 @@
+import pytest
+import utils
+from news_analyst import NewsAnalyst
+from run_checkpoint import RunCheckpoint
+
+RUN_DATE = "2026-10-19"
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(utils.time, "sleep", lambda s: None)
+
+def test_failed_cio_stage_is_recomputed_on_resume(tmp_path, monkeypatch):
+    analyst = NewsAnalyst()
+    calls = []
+
+    def llm_down(name, prompt):
+        calls.append(name)
+        raise RuntimeError("LLM 502")
+
+    # 第一次运行: LLM 挂掉，CIO 阶段失败，不能留下检查点
+    monkeypatch.setattr(analyst, "_post_summary", llm_down)
+    checkpoint = RunCheckpoint(str(tmp_path), run_date=RUN_DATE)
+    with pytest.raises(RuntimeError):
+        checkpoint.stage("cio", lambda: analyst.review_report("沪深300ETF: 买入 (分:72 熔断Lv:0)"))
+    assert calls == ["review_report", "review_report"]
+    assert not checkpoint.has("cio")
+
+    # 同日重跑: 重新调用 LLM 并落盘
+    monkeypatch.setattr(analyst, "_post_summary", lambda name, prompt: "```html<p>CIO 指令: 半仓</p>```")
+    checkpoint = RunCheckpoint(str(tmp_path), run_date=RUN_DATE)
+    assert checkpoint.stage("cio", lambda: analyst.review_report("...")) == "<p>CIO 指令: 半仓</p>"
+    assert checkpoint.has("cio")
+
+    # 再次重跑: 直接读回，不再调用 LLM
+    calls.clear()
+    monkeypatch.setattr(analyst, "_post_summary", llm_down)
+    checkpoint = RunCheckpoint(str(tmp_path), run_date=RUN_DATE)
+    assert checkpoint.stage("cio", lambda: analyst.review_report("...")) == "<p>CIO 指令: 半仓</p>"
+    assert calls == []
+
+def test_advisor_failure_is_not_checkpointed(tmp_path, monkeypatch):
+    analyst = NewsAnalyst()
+
+    def llm_down(name, prompt):
+        raise utils.CircuitOpenError("llm")
+
+    monkeypatch.setattr(analyst, "_post_summary", llm_down)
+    checkpoint = RunCheckpoint(str(tmp_path), run_date=RUN_DATE)
+    with pytest.raises(utils.CircuitOpenError):
+        checkpoint.stage("advisor", lambda: analyst.advisor_review("...", "无新增宏观情报"))
+    assert not checkpoint.has("advisor")
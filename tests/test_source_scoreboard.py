@@ -0,0 +1,20 @@
+from source_scoreboard import SourceScoreboard
+
+def test_fast_failing_source_ranks_after_slow_healthy_one(tmp_path):
+    board = SourceScoreboard(str(tmp_path / "health.json"))
+    for _ in range(10):
+        board.record("news.cls", False, 0.002)
+        board.record("news.eastmoney", True, 0.8)
+    assert board.order("news", ["cls", "eastmoney"]) == ["eastmoney", "cls"]
+
+def test_unrecorded_sources_keep_default_order_last(tmp_path):
+    board = SourceScoreboard(str(tmp_path / "health.json"))
+    board.record("history.sina", True, 1.5)
+    assert board.order("history", ["eastmoney", "tencent", "sina"]) == ["sina", "eastmoney", "tencent"]
+
+def test_occasional_failure_does_not_outrank_much_faster_source(tmp_path):
+    board = SourceScoreboard(str(tmp_path / "health.json"), failure_cooldown=0)
+    for i in range(20):
+        board.record("history.eastmoney", i % 10 != 0, 0.3)
+        board.record("history.sina", True, 4.0)
+    assert board.order("history", ["sina", "eastmoney"]) == ["eastmoney", "sina"]
@@ -0,0 +1,154 @@
+import json
+import os
+import sys
+import bisect
+from datetime import date, datetime, timedelta, time as dt_time
+from utils import logger, get_beijing_time
+
+CALENDAR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trading_calendar.json')
+
+AM_OPEN, AM_CLOSE = dt_time(9, 30), dt_time(11, 30)
+PM_OPEN, PM_CLOSE = dt_time(13, 0), dt_time(15, 0)
+
+class TradingCalendar:
+    """
+    [V15 交易日历] 沪深交易所
+    随仓库附带 trading_calendar.json (区间内的工作日休市日)，离线可用。
+    预先展开为有序交易日数组 + 日期->序号索引，日期查询 O(1)。
+    区间之外退化为 "周一至周五" 规则。
+    """
+    def __init__(self, start, end, holidays):
+        self.start = start
+        self.end = end
+        self.holidays = set(holidays)
+        self.days = []
+        d = start
+        while d <= end:
+            if d.weekday() < 5 and d not in self.holidays:
+                self.days.append(d)
+            d += timedelta(days=1)
+        self.index = {d.toordinal(): i for i, d in enumerate(self.days)}
+        self.ordinals = [d.toordinal() for d in self.days]
+        self._warned = False
+
+    @classmethod
+    def load(cls, path=CALENDAR_FILE):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(date.fromisoformat(data['start']), date.fromisoformat(data['end']),
+                       [date.fromisoformat(d) for d in data['holidays']])
+        except Exception as e:
+            logger.warning(f"交易日历加载失败，按工作日规则处理: {e}")
+            today = get_beijing_time().date()
+            return cls(today, today - timedelta(days=1), [])
+
+    @staticmethod
+    def refresh(path=CALENDAR_FILE):
+        """从新浪交易日历 (akshare) 重建附带文件"""
+        import akshare as ak
+        df = ak.tool_trade_date_hist_sina()
+        trade_days = {date.fromisoformat(str(d)[:10]) for d in df['trade_date']}
+        start, end = min(trade_days), max(trade_days)
+        start = max(start, date(end.year - 3, 1, 1))
+        holidays = []
+        d = start
+        while d <= end:
+            if d.weekday() < 5 and d not in trade_days:
+                holidays.append(d.isoformat())
+            d += timedelta(days=1)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"exchange": "SSE/SZSE", "start": start.isoformat(), "end": end.isoformat(), "holidays": holidays}, f, indent=2)
+        logger.info(f"📅 交易日历已更新: {start} ~ {end}，休市 {len(holidays)} 天")
+
+    @staticmethod
+    def _as_date(d):
+        return d.date() if isinstance(d, datetime) else d
+
+    def _covered(self, d):
+        if self.start <= d <= self.end: return True
+        if not self._warned:
+            logger.warning(f"📅 {d} 超出交易日历范围 ({self.start}~{self.end})，按工作日规则处理，请运行 python trading_calendar.py --refresh")
+            self._warned = True
+        return False
+
+    def is_trading_day(self, d):
+        d = self._as_date(d)
+        if not self._covered(d): return d.weekday() < 5
+        return d.toordinal() in self.index
+
+    def session(self, now):
+        """返回 pre / am / lunch / pm / closed"""
+        if not self.is_trading_day(now): return "closed"
+        t = now.time()
+        if t < AM_OPEN: return "pre"
+        if t <= AM_CLOSE: return "am"
+        if t < PM_OPEN: return "lunch"
+        if t <= PM_CLOSE: return "pm"
+        return "closed"
+
+    def is_trading_time(self, now):
+        """连续竞价时段 (不含午休)"""
+        return self.session(now) in ("am", "pm")
+
+    def _position(self, d):
+        """d 当日或之前最近一个交易日在数组中的序号 (区间内有效)"""
+        return bisect.bisect_right(self.ordinals, d.toordinal()) - 1
+
+    def previous_trading_day(self, d):
+        d = self._as_date(d) - timedelta(days=1)
+        if self._covered(d):
+            i = self._position(d)
+            if i >= 0: return self.days[i]
+        while d.weekday() >= 5:
+            d -= timedelta(days=1)
+        return d
+
+    def trading_days_before(self, d, n):
+        """d 之前 (含 d) 倒数第 n 个交易日，用于把 "需要 n 根K线" 换算为起始日期"""
+        d = self._as_date(d)
+        if self._covered(d):
+            i = self._position(d) - (n - 1)
+            if i >= 0: return self.days[i]
+        while n > 0:
+            if self.is_trading_day(d): n -= 1
+            if n > 0: d -= timedelta(days=1)
+        return d
+
+    def last_complete_day(self, now):
+        """截至 now 最近一根已收盘的日K线所属日期"""
+        if self.is_trading_day(now) and now.time() >= PM_CLOSE:
+            return self._as_date(now)
+        return self.previous_trading_day(now)
+
+    def bars_between(self, d1, d2):
+        """(d1, d2] 区间内的交易日数量"""
+        d1, d2 = self._as_date(d1), self._as_date(d2)
+        if d2 <= d1: return 0
+        if self._covered(d1) and self._covered(d2):
+            return self._position(d2) - self._position(d1)
+        n, d = 0, d1 + timedelta(days=1)
+        while d <= d2:
+            if self.is_trading_day(d): n += 1
+            d += timedelta(days=1)
+        return n
+
+    def bars_since(self, last_complete, now):
+        """自上次缓存 (已收盘K线截至 last_complete) 以来新增的完整日K线数量"""
+        return self.bars_between(last_complete, self.last_complete_day(now))
+
+_CALENDAR = None
+
+def get_calendar():
+    global _CALENDAR
+    if _CALENDAR is None:
+        _CALENDAR = TradingCalendar.load()
+    return _CALENDAR
+
+if __name__ == "__main__":
+    if "--refresh" in sys.argv:
+        TradingCalendar.refresh()
+    else:
+        cal = get_calendar()
+        now = get_beijing_time()
+        print(f"{now:%Y-%m-%d %H:%M} 交易日: {cal.is_trading_day(now)} | 时段: {cal.session(now)} | 上一交易日: {cal.previous_trading_day(now)}")
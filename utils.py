@@ -3,6 +3,9 @@ import smtplib
 import os
 import time
 import functools
+import random
+import threading
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.header import Header
 from email.utils import formataddr # [新增] 用于构建标准的邮件地址格式
@@ -22,35 +25,135 @@ def get_beijing_time():
     beijing_tz = pytz.timezone('Asia/Shanghai')
     return utc_now.replace(tzinfo=pytz.utc).astimezone(beijing_tz)
 
-def retry(retries=3, delay=2):
+class DeadlineExceeded(Exception):
+    """本次运行 / 本只基金的时间预算已耗尽"""
+
+class CircuitOpenError(Exception):
+    """数据源熔断器已打开，本次运行内跳过该源"""
+
+class CircuitBreaker:
     """
-    函数重试装饰器
+    按数据源计数的熔断器: 连续失败 threshold 次后打开，本次运行内不再尝试。
+    任意一次成功会清零计数。
     """
-    def decorator(func):
+    def __init__(self, name, threshold=3):
+        self.name = name
+        self.threshold = threshold
+        self.failures = 0
+        self.is_open = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        return not self.is_open
+
+    def record(self, ok):
+        with self.lock:
+            if ok:
+                self.failures = 0
+                return
+            self.failures += 1
+            if not self.is_open and self.failures >= self.threshold:
+                self.is_open = True
+                logger.error(f"🔌 [熔断器] {self.name} 连续失败 {self.failures} 次，本次运行内跳过")
+
+_RETRY_SETTINGS = {"breaker_threshold": 3, "run_deadline": None}
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+_DEADLINE_LOCAL = threading.local()
+
+def configure_retry(config):
+    """从 config.yaml 的 global.retry 读取整次运行预算与熔断阈值"""
+    cfg = config.get('global', {}).get('retry', {})
+    _RETRY_SETTINGS['breaker_threshold'] = cfg.get('breaker_threshold', 3)
+    run_budget = cfg.get('run_budget')
+    _RETRY_SETTINGS['run_deadline'] = time.monotonic() + run_budget if run_budget else None
+    return cfg
+
+def get_breaker(name):
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, _RETRY_SETTINGS['breaker_threshold'])
+            _BREAKERS[name] = breaker
+        return breaker
+
+@contextmanager
+def fund_deadline(seconds):
+    """单只基金的时间预算 (线程内有效)"""
+    previous = getattr(_DEADLINE_LOCAL, 'deadline', None)
+    _DEADLINE_LOCAL.deadline = time.monotonic() + seconds if seconds else None
+    try:
+        yield
+    finally:
+        _DEADLINE_LOCAL.deadline = previous
+
+def remaining_budget():
+    """返回当前线程剩余的时间预算 (秒)，无预算时返回 None"""
+    deadlines = [d for d in (_RETRY_SETTINGS['run_deadline'], getattr(_DEADLINE_LOCAL, 'deadline', None)) if d]
+    if not deadlines: return None
+    return min(deadlines) - time.monotonic()
+
+def budget_timeout(timeout):
+    """把请求超时压缩到剩余预算以内"""
+    remaining = remaining_budget()
+    if remaining is None: return timeout
+    if remaining <= 0: raise DeadlineExceeded("时间预算已耗尽")
+    return min(timeout, remaining)
+
+class RetryPolicy:
+    """
+    重试策略装饰器:
+    1. 指数退避 + 抖动: delay * 2^i，封顶 max_delay，再乘以 [1-jitter, 1]
+    2. 截止时间感知: 剩余预算不够下一次退避就直接放弃
+    3. 可选熔断器: 熔断打开后直接抛 CircuitOpenError，不再发起请求
+    """
+    def __init__(self, retries=3, delay=2, max_delay=30, jitter=0.5, breaker=None):
+        self.retries = retries
+        self.delay = delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.breaker = breaker
+
+    def backoff(self, attempt):
+        base = min(self.max_delay, self.delay * (2 ** attempt))
+        return base * (1 - random.uniform(0, self.jitter))
+
+    def __call__(self, func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            for i in range(retries):
+            breaker = get_breaker(self.breaker) if self.breaker else None
+            for i in range(self.retries):
+                if breaker and not breaker.allow():
+                    raise CircuitOpenError(self.breaker)
+                remaining = remaining_budget()
+                if remaining is not None and remaining <= 0:
+                    raise DeadlineExceeded(f"{func.__name__} 时间预算已耗尽")
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
+                    if breaker: breaker.record(True)
+                    return result
+                except (DeadlineExceeded, CircuitOpenError):
+                    raise
                 except Exception as e:
-                    if i == retries - 1:
+                    if breaker: breaker.record(False)
+                    wait = self.backoff(i)
+                    remaining = remaining_budget()
+                    give_up = i == self.retries - 1 or (breaker and not breaker.allow())
+                    if give_up or (remaining is not None and wait >= remaining):
                         logger.error(f"❌ {func.__name__} 最终失败: {e}")
                         raise e
-                    logger.warning(f"⚠️ {func.__name__} 失败，{delay}秒后重试 ({i+1}/{retries})...")
-                    time.sleep(delay)
+                    logger.warning(f"⚠️ {func.__name__} 失败，{wait:.1f}秒后重试 ({i+1}/{self.retries})...")
+                    time.sleep(wait)
         return wrapper
-    return decorator
-
-def send_email(subject, content):
-    sender = os.environ.get('MAIL_USER')
-    password = os.environ.get('MAIL_PASS')
-    receivers = [sender]
 
-    if not sender or not password:
-        logger.warning("未配置邮件账户，跳过发送")
-        return
+def retry(retries=3, delay=2, **kwargs):
+    """
+    函数重试装饰器 (RetryPolicy 的快捷方式)
+    """
+    return RetryPolicy(retries=retries, delay=delay, **kwargs)
 
-    message = MIMEText(content, 'html', 'utf-8')
+def build_message(subject, content, sender, subtype='html'):
+    message = MIMEText(content, subtype, 'utf-8')
     
     # [修复核心] 使用 formataddr 构建符合 RFC 标准的发件人头
     # 格式效果: "玄铁量化 V15 <123456@qq.com>"
@@ -58,9 +161,22 @@ def send_email(subject, content):
     
     message['To'] = Header("Commander", 'utf-8')
     message['Subject'] = Header(subject, 'utf-8')
+    return message
+
+def send_email(subject, content, subtype='html'):
+    """同步直发 (单封)。日常报告请走 mail_queue.MailQueue"""
+    sender = os.environ.get('MAIL_USER')
+    password = os.environ.get('MAIL_PASS')
+    receivers = [sender]
+
+    if not sender or not password:
+        logger.warning("未配置邮件账户，跳过发送")
+        return
+
+    message = build_message(subject, content, sender, subtype)
 
     try:
-        smtp_obj = smtplib.SMTP_SSL('smtp.qq.com', 465)
+        smtp_obj = smtplib.SMTP_SSL(os.environ.get('MAIL_SMTP_HOST', 'smtp.qq.com'), int(os.environ.get('MAIL_SMTP_PORT', 465)))
         smtp_obj.login(sender, password)
         smtp_obj.sendmail(sender, receivers, message.as_string())
         logger.info("📧 邮件发送成功")